@@ -1,3 +1,10 @@
-from .celery import app as celery_app
+# The Celery app is loaded on first access instead of at Django startup, so that web workers do not import
+# Celery. `celery -A task_management` finds it in `task_management.celery`.
+def __getattr__(name):
+    if name == 'celery_app':
+        from .celery import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ('celery_app',)
\ No newline at end of file
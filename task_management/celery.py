@@ -1,6 +1,7 @@
 import os
 
 from celery import Celery
+from celery.signals import task_postrun, task_prerun
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_management.settings')
@@ -16,4 +17,13 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
-app.conf.broker_connection_retry_on_startup = True
\ No newline at end of file
+app.conf.broker_connection_retry_on_startup = True
+
+# Record queue latency, runtime and overlap metrics through Celery signals.
+import tasks.telemetry  # noqa: E402, F401
+
+# Scope the slow query log to each task execution.
+from tasks.querylog import begin_task_scope, end_task_scope  # noqa: E402
+
+task_prerun.connect(begin_task_scope)
+task_postrun.connect(end_task_scope)
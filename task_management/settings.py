@@ -55,6 +55,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'tasks.middleware.RequestElapsedTimeMiddleware',  # Custom middleware
+    'tasks.middleware.QueryScopeMiddleware',  # Custom middleware
+    'tasks.middleware.RequestProfilerMiddleware',  # Custom middleware
 ]
 
 ROOT_URLCONF = 'task_management.urls'
@@ -87,6 +89,24 @@ DATABASES = {
     }
 }
 
+# User-sharded task storage: with TASK_SHARD_COUNT > 0, each user's tasks are stored on one of the
+# `shard_<n>` databases while users and auth tables stay on `default`. Create a shard's tables with
+# `python manage.py migrate --database shard_<n>`.
+TASK_SHARD_COUNT = int(os.getenv('TASK_SHARD_COUNT', 0))
+TASK_SHARDS = [f'shard_{index}' for index in range(TASK_SHARD_COUNT)] or ['default']
+
+for shard in TASK_SHARDS:
+    if shard != 'default':
+        DATABASES[shard] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / f'db_{shard}.sqlite3',
+        }
+
+# Task ids are unique across shards and reserved from the primary database in blocks of this size per process.
+TASK_ID_BLOCK_SIZE = 100
+
+DATABASE_ROUTERS = ['tasks.routers.UserShardRouter']
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -150,6 +170,9 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(hours=12),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    # Revoked refresh tokens are kept in Redis; remove these two entries to fall back to the blacklist tables.
+    'TOKEN_OBTAIN_SERIALIZER': 'tasks.serializers.RedisTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'tasks.serializers.RedisTokenRefreshSerializer',
 }
 
 # Logging settings
@@ -172,6 +195,15 @@ LOGGING = {
             'interval': 1,
             'backupCount': 7,
             'formatter': 'verbose',
+        },
+        'slow_queries_file': {
+            'level': 'INFO',
+            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'filename': BASE_DIR / 'log/slow_queries.log',
+            'when': 'midnight',
+            'interval': 1,
+            'backupCount': 7,
+            'formatter': 'verbose',
         }
     },
     'loggers': {
@@ -180,9 +212,26 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'tasks.slow_queries': {
+            'handlers': ['slow_queries_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# Slow query log config
+SLOW_QUERY_LOG_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = 100  # Queries at least this slow are logged with their query plan
+SLOW_QUERY_REPEAT_THRESHOLD = 5  # Query shapes repeated this often within a request or task are flagged
+
+# Request profiler config
+PROFILER_ENABLED = True
+PROFILER_SAMPLE_RATE = 0.0  # Fraction of staff requests profiled without a profile token
+PROFILER_TOKEN_MAX_AGE = 60 * 60  # 60 minutes
+PROFILER_DIR = BASE_DIR / 'log/profiles'
+PROFILER_MAX_FILES = 100
+
 # Cache config
 CACHE_TTL = 60 * 60  # 60 minutes
 
@@ -196,6 +245,38 @@ CACHES = {
     }
 }
 
+# Delta sync config
+TOMBSTONE_RETENTION = timedelta(days=30)  # Clients idle for longer must perform a full resync
+SYNC_WATERMARK_LAG = timedelta(seconds=30)  # Longer than any write transaction, so late commits are not skipped
+
+# Task event push channel config
+TASK_EVENTS_KEEPALIVE = 15  # Seconds between SSE keepalive comments
+TASK_EVENTS_LONG_POLL_TIMEOUT = 25  # Seconds a long-poll request waits for events
+TASK_EVENTS_RETRY_MS = 3000  # Client reconnection delay advertised to EventSource
+TASK_EVENTS_QUEUE_SIZE = 100  # Events buffered per connection before dropping
+TASK_EVENTS_RECONNECT_DELAY = 1  # Seconds before resubscribing after a Redis disconnect
+
+# Batch endpoint config
+BATCH_MAX_REQUESTS = 20
+
+# Task analytics config
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 366
+ROLLUP_WATERMARK_LAG = timedelta(seconds=30)  # Rollups stop this far behind now so that late commits are not skipped
+
+# Recurring task config
+RECURRENCE_MAX_WINDOW = timedelta(days=366)  # Widest start/end window in which occurrences are expanded
+RECURRENCE_MAX_SERIES_OCCURRENCES = 400  # Most occurrences of one recurring task expanded for a request
+RECURRENCE_MAX_OCCURRENCES = 2000  # Most occurrences of all recurring tasks expanded for a request
+
+# Startup import budget config, enforced by `tasks.tests` and `manage.py startup_profile --check`.
+# Budgets are module counts, as wall time depends on the machine. Raise a budget only together with
+# the change that needs it.
+STARTUP_IMPORT_BUDGET = {
+    'web': 800,
+    'celery': 975,
+}
+
 # Celery Configuration Options
 CELERY_TIMEZONE = "Asia/Kolkata"
 CELERY_BROKER_URL = f'redis://{os.getenv("REDIS_HOST")}:{os.getenv("REDIS_PORT")}/0'
@@ -208,9 +289,21 @@ CELERY_BEAT_SCHEDULE = {
     'expired-tokens-cleanup-every-day': {
         'task': 'tasks.tasks.expired_tokens_cleanup',
         'schedule': timedelta(days=1)
+    },
+    'tombstones-cleanup-every-day': {
+        'task': 'tasks.tasks.tombstones_cleanup',
+        'schedule': timedelta(days=1)
+    },
+    'update-task-rollups-every-ten-minutes': {
+        'task': 'tasks.tasks.update_task_rollups',
+        'schedule': timedelta(minutes=10)
     }
 }
 
+# Celery metrics config: Prometheus scrapes `/api/metrics/celery/` with `Authorization: Token <METRICS_SCRAPE_TOKEN>`.
+# Unset, only staff users can read the metrics.
+METRICS_SCRAPE_TOKEN = os.getenv('METRICS_SCRAPE_TOKEN')
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -218,3 +311,6 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+
+# Due task reminders: 'digest' sends one email per user and due time, 'per_task' one email per task
+DUE_TASK_EMAIL_MODE = 'digest'
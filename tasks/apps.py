@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TasksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tasks'
+
+    def ready(self):
+        # Install the slow query logger on new database connections and connect model signal handlers.
+        from . import querylog, signals  # noqa: F401
@@ -13,4 +13,40 @@ RESPONSE_500 = {'detail': 'Internal Server Error'}
 
 CACHE_USER_KEY = 'user_details_{}'
 
-CACHE_TASK_KEY = 'task_list_{}'
+CACHE_TASK_KEY = 'task_list_{}_{}_page_{}'
+
+CACHE_TASK_LIST_VERSION_KEY = 'task_list_version_{}'
+
+CACHE_TASK_DETAIL_KEY = 'task_{}_{}'
+
+RESPONSE_INVALID_SINCE = {'detail': "Query parameter 'since' must be an ISO 8601 datetime."}
+
+RESPONSE_SYNC_EXPIRED = {'detail': "'since' is older than the tombstone retention window. Please perform a full resync."}
+
+TASK_EVENTS_CHANNEL = 'task_events_{}'
+
+RESPONSE_401 = {'error': 'Authentication failed.', 'detail': 'Token is invalid or expired'}
+
+CACHE_REVOKED_TOKEN_KEY = 'revoked_token_{}'
+
+PROFILER_TOKEN_SALT = 'tasks.profiler'
+
+CACHE_TASK_SHARD_KEY = 'task_shard_{}'
+
+ROLLUP_WATERMARK_NAME = 'task_daily_rollup'
+
+RESPONSE_INVALID_DAYS = {'detail': "Query parameter 'days' must be an integer between 1 and {}."}
+
+RESPONSE_INVALID_BATCH = {'detail': "'requests' must be a list of 1 to {} sub-requests."}
+
+BATCH_METHODS = ('GET', 'POST', 'PATCH', 'DELETE')
+
+BATCH_EXCLUDED_URL_NAMES = ('batch', 'task-events', 'token_obtain_pair', 'token_refresh')
+
+RESPONSE_INVALID_WINDOW = {'detail': "Query parameters 'start' and 'end' must be ISO 8601 datetimes, with 'end' after 'start' and at most {} days apart."}
+
+RESPONSE_INVALID_OCCURRENCE = {'detail': 'Not an occurrence of this task.'}
+
+RESPONSE_CANCELLED_OCCURRENCE = {'detail': 'This occurrence was deleted.'}
+
+RESPONSE_TOO_MANY_OCCURRENCES = {'detail': "Too many occurrences of recurring tasks between 'start' and 'end'. Narrow the window."}
@@ -0,0 +1,110 @@
+# Standard library imports
+import asyncio
+import json
+import logging
+import weakref
+
+# Django imports
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Third-party imports
+from django_redis import get_redis_connection
+
+# Local imports
+from .constants import TASK_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+def publish_task_event(user_id, event, task_data):
+    """
+    Publishes a task `event` ('created', 'updated' or 'deleted') to the user's Redis channel.
+
+    Failures are logged and swallowed so that the write path never fails because of the push channel.
+    """
+    try:
+        message = json.dumps({'event': event, 'task': task_data}, cls=DjangoJSONEncoder)
+        get_redis_connection('default').publish(TASK_EVENTS_CHANNEL.format(user_id), message)
+    except Exception as e:
+        logger.warning(f"Could not publish task event {event} for user {user_id}: {str(e)}")
+
+
+class TaskEventHub:
+    """
+    Fans task events out from a single Redis pattern subscription to per-connection queues.
+
+    One hub (and one Redis connection) is shared by every client connected to the worker, so an idle
+    client costs only an `asyncio.Queue`.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.listener = None
+
+    def subscribe(self, user_id):
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.get_running_loop().create_task(self.listen())
+
+        queue = asyncio.Queue(maxsize=settings.TASK_EVENTS_QUEUE_SIZE)
+        self.queues.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        user_queues = self.queues.get(user_id, set())
+        user_queues.discard(queue)
+        if not user_queues:
+            self.queues.pop(user_id, None)
+
+        # Release the Redis connection once the last client has gone away.
+        if not self.queues and self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    async def listen(self):
+        # Imported here because only processes serving the event stream need the asyncio client.
+        from redis import asyncio as aioredis
+
+        pattern = TASK_EVENTS_CHANNEL.format('*')
+        prefix_length = len(TASK_EVENTS_CHANNEL.format(''))
+
+        # Reconnects reuse the client's connection pool, which is closed when the listener is cancelled.
+        client = aioredis.from_url(settings.CACHES['default']['LOCATION'])
+        try:
+            while True:
+                try:
+                    async with client.pubsub() as pubsub:
+                        await pubsub.psubscribe(pattern)
+                        async for message in pubsub.listen():
+                            if message['type'] != 'pmessage':
+                                continue
+                            self.dispatch(int(message['channel'][prefix_length:]), message['data'])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Task event listener disconnected: {str(e)}")
+                    await asyncio.sleep(settings.TASK_EVENTS_RECONNECT_DELAY)
+        finally:
+            await client.aclose()
+
+    def dispatch(self, user_id, data):
+        for queue in self.queues.get(user_id, ()):
+            try:
+                queue.put_nowait(data.decode())
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping task event for slow client of user {user_id}")
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_event_hub():
+    """
+    Returns the hub bound to the running event loop.
+
+    Under ASGI there is a single loop per worker; under WSGI every async request runs in its own loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = TaskEventHub()
+    return _hubs[loop]
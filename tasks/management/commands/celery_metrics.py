@@ -0,0 +1,43 @@
+# Django imports
+from django.core.management.base import BaseCommand
+
+# Local imports
+from tasks.telemetry import get_metrics, render_prometheus, reset_metrics
+
+
+class Command(BaseCommand):
+    """
+    Prints a per-task summary of the Celery telemetry recorded in Redis.
+    """
+    help = 'Summarizes Celery task queue latency, runtime, overlaps and counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prometheus', action='store_true', help='Print the Prometheus exposition instead.')
+        parser.add_argument('--reset', action='store_true', help='Clear the recorded metrics after printing them.')
+
+    def handle(self, *args, **options):
+        metrics = get_metrics()
+
+        if options['prometheus']:
+            self.stdout.write(render_prometheus(metrics), ending='')
+        elif not metrics:
+            self.stdout.write('No Celery task metrics recorded yet.')
+        else:
+            for task_name, task_metrics in metrics.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(task_name))
+                self.stdout.write(
+                    f"  published {task_metrics.get('published', 0):g}, started {task_metrics.get('started', 0):g}, "
+                    f"succeeded {task_metrics.get('succeeded', 0):g}, failed {task_metrics.get('failed', 0):g}, "
+                    f"running {task_metrics['running']}, overlaps {task_metrics.get('overlaps', 0):g}"
+                )
+                for histogram, label in (('latency', 'queue latency'), ('runtime', 'runtime')):
+                    count = task_metrics.get(f'{histogram}_count', 0)
+                    if count:
+                        average = task_metrics[f'{histogram}_sum'] / count
+                        self.stdout.write(f'  {label}: avg {average:.3f}s over {count:g} runs')
+                for field, value in task_metrics.items():
+                    if field.startswith('counter_'):
+                        self.stdout.write(f'  {field[8:]}: {value:g}')
+
+        if options['reset']:
+            reset_metrics()
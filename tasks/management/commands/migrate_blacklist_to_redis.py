@@ -0,0 +1,43 @@
+# Django imports
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+# Third-party imports
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+# Local imports
+from tasks.tokens import revoke_token
+
+
+class Command(BaseCommand):
+    """
+    Copies still-valid revocations from the token blacklist tables into Redis.
+
+    Run it once after switching to the Redis revocation backend so that tokens blacklisted before the
+    switch stay revoked. With `--purge`, the legacy rows are deleted afterwards.
+    """
+    help = 'Copies unexpired blacklisted refresh tokens into the Redis revocation store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--purge', action='store_true',
+            help='Delete the outstanding and blacklisted token rows once they have been copied.',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        blacklisted_tokens = BlacklistedToken.objects.select_related('token').filter(
+            token__expires_at__gt=now
+        ).iterator()
+
+        migrated = 0
+        for blacklisted_token in blacklisted_tokens:
+            revoke_token(blacklisted_token.token.jti, blacklisted_token.token.expires_at.timestamp())
+            migrated += 1
+
+        self.stdout.write(f'Migrated {migrated} revoked tokens to Redis.')
+
+        if options['purge']:
+            # Blacklisted rows cascade with their outstanding token.
+            deleted, _ = OutstandingToken.objects.all().delete()
+            self.stdout.write(f'Deleted {deleted} legacy token rows.')
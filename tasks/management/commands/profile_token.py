@@ -0,0 +1,23 @@
+# Django imports
+from django.conf import settings
+from django.core import signing
+from django.core.management.base import BaseCommand
+
+# Local imports
+from tasks.constants import PROFILER_TOKEN_SALT
+
+
+class Command(BaseCommand):
+    """
+    Prints a signed value for the `X-Profile-Token` header, which makes `RequestProfilerMiddleware`
+    profile the request.
+    """
+    help = 'Generates a signed X-Profile-Token header value for profiling requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--label', default='manual', help='Free-form label stored in the signed token.')
+
+    def handle(self, *args, **options):
+        token = signing.dumps({'label': options['label']}, salt=PROFILER_TOKEN_SALT)
+        self.stdout.write(token)
+        self.stderr.write(f'Valid for {settings.PROFILER_TOKEN_MAX_AGE} seconds.')
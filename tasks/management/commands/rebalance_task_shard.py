@@ -0,0 +1,78 @@
+# Django imports
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+# Local imports
+from tasks.constants import CACHE_TASK_SHARD_KEY
+from tasks.models import Task, TaskTombstone, TaskDailyRollup, ShardAssignment
+from tasks.sharding import seed_task_ids, shard_for_user
+
+
+class Command(BaseCommand):
+    """
+    Moves the tasks, tombstones and rollups of one or more users to another shard and pins them there.
+
+    Tasks are copied with their original ids and timestamps before being deleted from the source. Writes made
+    by the users while they are being moved may be lost, so run it while they are inactive.
+
+    The task id tickets are first moved past the ids on the source so that tasks created on the shards
+    afterwards cannot collide with tasks still waiting to be moved off `default`.
+    """
+    help = "Moves users' tasks to another shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='+', type=int, help='Ids of the users to move.')
+        parser.add_argument('--to', required=True, dest='target', help='Alias of the destination shard.')
+        parser.add_argument(
+            '--from', dest='source',
+            help="Alias to move the tasks from instead of the users' current shard, "
+                 "e.g. 'default' when enabling sharding on an existing database.",
+        )
+
+    def handle(self, *args, **options):
+        target = options['target']
+        if target not in settings.TASK_SHARDS:
+            raise CommandError(f"Unknown shard '{target}'. Available shards: {', '.join(settings.TASK_SHARDS)}.")
+
+        for user_id in options['user_ids']:
+            source = options['source'] or shard_for_user(user_id)
+            if source not in settings.DATABASES:
+                raise CommandError(f"Unknown database '{source}'.")
+
+            if source == target:
+                self.stdout.write(f'User {user_id} is already on {target}.')
+                continue
+
+            seed_task_ids(source)
+            try:
+                moved = self.move_user(user_id, source, target)
+            except IntegrityError as e:
+                raise CommandError(f'Could not move the tasks of user {user_id} to {target}: {e}')
+            cache.delete(CACHE_TASK_SHARD_KEY.format(user_id))
+            self.stdout.write(f'Moved {moved} tasks of user {user_id} from {source} to {target}.')
+
+    def move_user(self, user_id, source, target):
+        moved = 0
+
+        with transaction.atomic(using=source), transaction.atomic(using=target):
+            for model in (Task, TaskTombstone, TaskDailyRollup):
+                rows = list(model.objects.using(source).filter(user_id=user_id))
+
+                # Raw saves keep the auto_now timestamps. Only task ids are unique across shards, so
+                # tombstones and rollups are given new ids on the target.
+                for row in rows:
+                    if model is not Task:
+                        row.pk = None
+                    row.save_base(using=target, raw=True, force_insert=True)
+
+                if model is Task:
+                    moved = len(rows)
+
+            ShardAssignment.objects.update_or_create(user_id=user_id, defaults={'shard': target})
+
+            for model in (Task, TaskTombstone, TaskDailyRollup):
+                model.objects.using(source).filter(user_id=user_id).delete()
+
+        return moved
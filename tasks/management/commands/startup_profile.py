@@ -0,0 +1,46 @@
+# Django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# Local imports
+from tasks.startup import ENTRY_POINTS, check_budget, measure_startup
+
+
+class Command(BaseCommand):
+    """
+    Starts the web and Celery entry points in fresh interpreters and reports what their imports cost.
+    """
+    help = 'Reports per-module import cost of the web and Celery worker cold start.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entry_points', nargs='*', help=f"Entry points to profile: {', '.join(ENTRY_POINTS)} (default: all).")
+        parser.add_argument('--top', type=int, default=20, help='Number of modules to list per entry point.')
+        parser.add_argument('--sort', choices=('cumulative', 'self'), default='cumulative', help='Order modules by cumulative or self import time.')
+        parser.add_argument('--check', action='store_true', help='Fail when an entry point exceeds STARTUP_IMPORT_BUDGET.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['entry_points']) - set(ENTRY_POINTS)
+        if unknown:
+            raise CommandError(f"Unknown entry points: {', '.join(sorted(unknown))}.")
+
+        problems = []
+
+        for entry_point in options['entry_points'] or ENTRY_POINTS:
+            profile = measure_startup(entry_point)
+            problems += check_budget(entry_point, profile)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{entry_point}: {profile['seconds']:.3f}s, {profile['modules']} modules loaded"
+            ))
+            self.stdout.write(f"  {'cumulative':>12} {'self':>10}  module")
+
+            position = 2 if options['sort'] == 'cumulative' else 1
+            for module, self_us, cumulative_us, _ in sorted(
+                profile['imports'], key=lambda row: row[position], reverse=True
+            )[:options['top']]:
+                self.stdout.write(f"  {cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {module}")
+
+        for problem in problems:
+            self.stderr.write(self.style.ERROR(problem))
+
+        if options['check'] and problems:
+            raise CommandError('Startup import budget exceeded.')
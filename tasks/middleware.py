@@ -1,20 +1,181 @@
+import cProfile
+import os
+import random
+import re
 import time
+from datetime import datetime
 
 import logging
 
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .constants import PROFILER_TOKEN_SALT
+from .querylog import begin_scope, end_scope, get_current_scope
+
 logger = logging.getLogger(__name__)
 
-class RequestElapsedTimeMiddleware:
+class AsyncCapableMiddleware:
     """
-    Simple middleware that logs the elapsed time for each request processing.
+    Base for middleware that runs in the mode of the handler chain it wraps, so that async views served
+    under ASGI, such as the task event stream, do not each hold a thread while they wait.
+
+    Subclasses implement `__call__` for sync chains and `__acall__` for async ones.
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class RequestElapsedTimeMiddleware(AsyncCapableMiddleware):
+    """
+    Simple middleware that logs the elapsed time for each request processing.
+    """
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         request_path_info = request.META.get('PATH_INFO')
         start_time = time.time()
         response = self.get_response(request)
         logger.info(f'Elapsed time {time.time() - start_time:.2f} - {request_path_info}')
-        return response
\ No newline at end of file
+        return response
+
+    async def __acall__(self, request):
+        request_path_info = request.META.get('PATH_INFO')
+        start_time = time.time()
+        response = await self.get_response(request)
+        logger.info(f'Elapsed time {time.time() - start_time:.2f} - {request_path_info}')
+        return response
+
+
+class QueryScopeMiddleware(AsyncCapableMiddleware):
+    """
+    Middleware that attributes the queries of each request to its view for the slow query log.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = begin_scope(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            end_scope(token)
+
+    async def __acall__(self, request):
+        token = begin_scope(request.path)
+        try:
+            return await self.get_response(request)
+        finally:
+            end_scope(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        scope = get_current_scope()
+        if scope is not None:
+            view = getattr(view_func, 'view_class', view_func)
+            scope.label = f'{view.__module__}.{view.__qualname__} ({request.path})'
+
+
+class RequestProfilerMiddleware(AsyncCapableMiddleware):
+    """
+    Opt-in middleware that runs selected requests under cProfile and saves the stats next to the logs.
+
+    A request is profiled when it carries a valid signed `X-Profile-Token` header (see the `profile_token`
+    command), or when it is sampled with `PROFILER_SAMPLE_RATE` and made by a staff user. Other requests
+    only pay for a header lookup and, with sampling enabled, a random draw.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed()
+
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.has_profile_token(request) and not (self.is_sampled() and self.is_staff(request)):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        start_time = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        self.finish(profiler, request, start_time)
+        return response
+
+    async def __acall__(self, request):
+        if not self.has_profile_token(request) and not (self.is_sampled() and await sync_to_async(self.is_staff)(request)):
+            return await self.get_response(request)
+
+        # Drive the rest of the chain from a worker thread: `async_to_sync` then runs sync views back on that
+        # thread, inside the profiled call.
+        profiler = cProfile.Profile()
+        start_time = time.perf_counter()
+        response = await sync_to_async(profiler.runcall)(async_to_sync(self.get_response), request)
+        await sync_to_async(self.finish)(profiler, request, start_time)
+        return response
+
+    def finish(self, profiler, request, start_time):
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        try:
+            self.save_profile(profiler, request, elapsed_ms)
+        except Exception as e:
+            logger.error(f'Could not save profile for {request.path}: {str(e)}')
+
+    def has_profile_token(self, request):
+        token = request.META.get('HTTP_X_PROFILE_TOKEN')
+        if not token:
+            return False
+
+        try:
+            signing.loads(token, salt=PROFILER_TOKEN_SALT, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+            return True
+        except signing.BadSignature:
+            logger.warning(f'Invalid profile token for {request.path}')
+            return False
+
+    def is_sampled(self):
+        return bool(settings.PROFILER_SAMPLE_RATE) and random.random() < settings.PROFILER_SAMPLE_RATE
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+
+        # API requests authenticate with JWT in the view, so sampled requests authenticate here as well.
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        return authenticated is not None and authenticated[0].is_staff
+
+    def save_profile(self, profiler, request, elapsed_ms):
+        profile_dir = settings.PROFILER_DIR
+        os.makedirs(profile_dir, exist_ok=True)
+
+        path_slug = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        file_name = f'{datetime.now().strftime("%Y%m%d-%H%M%S-%f")}_{request.method}_{path_slug}_{elapsed_ms:.0f}ms.prof'
+        profiler.dump_stats(os.path.join(profile_dir, file_name))
+        logger.info(f'Profiled {request.method} {request.path} in {elapsed_ms:.0f} ms - {file_name}')
+
+        profiles = sorted(name for name in os.listdir(profile_dir) if name.endswith('.prof'))
+        for name in profiles[:-settings.PROFILER_MAX_FILES]:
+            os.remove(os.path.join(profile_dir, name))
@@ -3,8 +3,12 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+# Third-party imports
+from dateutil.rrule import rrulestr
+
 # Local imports
 from .constants import STATUS_CHOICES, NOT_AVAILABLE
+from .sharding import allocate_task_id, is_sharded, shard_for_user
 
 User = get_user_model()
 
@@ -20,24 +24,226 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class UserShardedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Returns the rows owned by `user`, read from the user's shard.
+        """
+        return self.using(shard_for_user(user.pk)).filter(user=user)
+
+
+class TooManyOccurrences(Exception):
+    """
+    Raised when expanding recurring tasks would produce more occurrences than allowed.
+    """
+
+
+class TaskQuerySet(UserShardedQuerySet):
+    def for_user(self, user):
+        """
+        Returns the tasks of `user`, read from the user's shard, leaving out cancelled occurrences.
+        """
+        return super().for_user(user).filter(is_cancelled=False)
+
+    def expand_occurrences(self, start, end, limit=None, series_limit=None):
+        """
+        Returns the occurrences of the recurring tasks in this queryset between `start` and `end` (inclusive)
+        as unsaved tasks, skipping the occurrences already materialized as rows, cancelled ones included.
+
+        Raises `TooManyOccurrences` when one series has more than `series_limit` occurrences in the window
+        or all of them together more than `limit`. Takes two queries however many occurrences fall in the window.
+        """
+        series_list = list(self.exclude(recurrence='').filter(due_date__lte=end))
+        if not series_list:
+            return []
+
+        materialized = set(
+            self.model.objects.using(self.db).filter(
+                series__in=[series.id for series in series_list],
+                occurrence_date__gte=start,
+                occurrence_date__lte=end,
+            ).values_list('series_id', 'occurrence_date')
+        )
+
+        occurrences = []
+        for series in series_list:
+            occurrences += [
+                series.make_occurrence(occurrence_date)
+                for occurrence_date in series.get_occurrences(start, end, series_limit)
+                if (series.id, occurrence_date) not in materialized
+            ]
+            if limit is not None and len(occurrences) > limit:
+                raise TooManyOccurrences(f'More than {limit} occurrences between {start} and {end}.')
+
+        return occurrences
+
+
 class Task(BaseModel):   
     """
     Represents a task associated with a user.
+
+    Tasks are stored on the shard of their user (see `tasks.routers.UserShardRouter`), so the user foreign key
+    has no database constraint and the user's tasks are deleted by the `pre_delete` handler in `tasks.signals`.
+
+    A task with a `recurrence` rule is a series: its occurrences are expanded on read and only stored, as tasks
+    pointing back to it through `series`, once they are edited.
     """
-    user        = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks', help_text='The user who owns this task.')
+    user        = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='tasks', help_text='The user who owns this task.')
     title       = models.CharField(max_length=128, default=NOT_AVAILABLE, help_text='The title of the task.')
     description = models.TextField(max_length=256, default=NOT_AVAILABLE, help_text='Detailed description of the task.')
     status      = models.CharField(max_length=16, choices=STATUS_CHOICES, default='draft', help_text='Current status of the task.')
     due_date    = models.DateTimeField(default=timezone.now, help_text='The due date and time for completing this task.')
+    status_changed_at = models.DateTimeField(null=True, blank=True, help_text='The date and time when the status last changed.')
+    recurrence  = models.CharField(max_length=256, blank=True, default='', help_text='RRULE repeating this task from its due date, e.g. "FREQ=WEEKLY;BYDAY=MO". Empty for one-off tasks.')
+    series      = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='exceptions', help_text='The recurring task this task is a materialized occurrence of.')
+    occurrence_date = models.DateTimeField(null=True, blank=True, help_text='The original date and time of the materialized occurrence.')
+    is_cancelled = models.BooleanField(default=False, help_text='Whether this materialized occurrence was deleted. The row is kept so that the series skips it.')
 
     class Meta:
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        indexes = [
+            models.Index(fields=['user']),
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['due_date']),
+            models.Index(fields=['due_date'], condition=~models.Q(recurrence=''), name='task_series_due_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'occurrence_date'], name='unique_task_occurrence'),
+        ]
+
+    objects = TaskQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    def get_occurrences(self, start, end, limit=None):
+        """
+        Returns the occurrence dates of this recurring task between `start` and `end` (inclusive).
+
+        The rule is expanded in the local time zone so that occurrences keep their wall-clock time. Raises
+        `TooManyOccurrences` when there are more than `limit` of them, without expanding the rest.
+        """
+        rule = rrulestr(self.recurrence, dtstart=timezone.localtime(self.due_date))
+
+        occurrences = []
+        for occurrence_date in rule.xafter(start, count=None if limit is None else limit + 1, inc=True):
+            if occurrence_date > end:
+                break
+            occurrences.append(occurrence_date)
+
+        if limit is not None and len(occurrences) > limit:
+            raise TooManyOccurrences(f'Task {self.id} has more than {limit} occurrences between {start} and {end}.')
+        return occurrences
+
+    def make_occurrence(self, occurrence_date):
+        """
+        Returns an unsaved task for the occurrence of this recurring task at `occurrence_date`.
+        """
+        return Task(
+            user_id=self.user_id,
+            title=self.title,
+            description=self.description,
+            status=self.status,
+            due_date=occurrence_date,
+            series_id=self.id,
+            occurrence_date=occurrence_date,
+            created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
+
+    def save(self, *args, **kwargs):
+        # Ids must stay unique across shards so that users can be moved between them.
+        if self.pk is None and is_sharded():
+            self.pk = allocate_task_id()
+        # Tasks created in a status other than the default, e.g. completed tasks or occurrences copying the
+        # status of their series, count as a status change for the rollups.
+        if self._state.adding and self.status_changed_at is None and self.status != self._meta.get_field('status').default:
+            self.status_changed_at = timezone.now()
+        super().save(*args, **kwargs)
+
+
+class TaskTombstone(models.Model):
+    """
+    Records the deletion of a task so that syncing clients can drop their local copy.
+    """
+    user       = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='task_tombstones', help_text='The user who owned the deleted task.')
+    task_id    = models.BigIntegerField(help_text='The id of the deleted task.')
+    deleted_at = models.DateTimeField(auto_now_add=True, help_text='The date and time when the task was deleted.')
+
     class Meta:
+        verbose_name = 'Task tombstone'
+        verbose_name_plural = 'Task tombstones'
         indexes = [
-            models.Index(fields=['user']),
-        ]
\ No newline at end of file
+            models.Index(fields=['user', 'deleted_at']),
+        ]
+
+    objects = UserShardedQuerySet.as_manager()
+
+    def __str__(self):
+        return f'Task {self.task_id} deleted at {self.deleted_at}'
+
+
+class TaskDailyRollup(models.Model):
+    """
+    Pre-aggregated per-user, per-day task counts for analytics, filled incrementally by `update_task_rollups`.
+    """
+    user           = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='task_rollups', help_text='The user the counts belong to.')
+    day            = models.DateField(help_text='The day the counts belong to.')
+    created        = models.PositiveIntegerField(default=0, help_text='Tasks created on this day.')
+    completed      = models.PositiveIntegerField(default=0, help_text='Tasks completed on this day.')
+    overdue        = models.PositiveIntegerField(default=0, help_text='Tasks that became overdue on this day without being completed.')
+    status_changes = models.PositiveIntegerField(default=0, help_text='Task status transitions on this day.')
+
+    objects = UserShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Task daily rollup'
+        verbose_name_plural = 'Task daily rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_task_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.day}'
+
+
+class RollupWatermark(models.Model):
+    """
+    Time up to which task changes on this database have been folded into the rollups.
+    """
+    name  = models.CharField(max_length=64, unique=True, help_text='The name of the rollup job.')
+    value = models.DateTimeField(null=True, blank=True, help_text='Changes up to this date and time have been processed.')
+
+    class Meta:
+        verbose_name = 'Rollup watermark'
+        verbose_name_plural = 'Rollup watermarks'
+
+    def __str__(self):
+        return f'{self.name} - {self.value}'
+
+
+class ShardAssignment(models.Model):
+    """
+    Pins a user's tasks to a shard other than the one chosen by `user_id % len(TASK_SHARDS)`.
+    """
+    user  = models.OneToOneField(User, on_delete=models.CASCADE, related_name='shard_assignment', help_text='The user whose tasks are pinned.')
+    shard = models.CharField(max_length=32, help_text='The database alias holding the user\'s tasks.')
+
+    class Meta:
+        verbose_name = 'Shard assignment'
+        verbose_name_plural = 'Shard assignments'
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.shard}'
+
+
+class TaskIdTicket(models.Model):
+    """
+    Ticket table on the primary database issuing blocks of task ids that are unique across shards.
+    """
+
+    class Meta:
+        verbose_name = 'Task id ticket'
+        verbose_name_plural = 'Task id tickets'
\ No newline at end of file
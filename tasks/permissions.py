@@ -0,0 +1,23 @@
+# Standard library imports
+import hmac
+
+# Django imports
+from django.conf import settings
+
+# Third-party imports
+from rest_framework import permissions
+
+
+class HasMetricsScrapeToken(permissions.BasePermission):
+    """
+    Allows requests carrying `Authorization: Token <METRICS_SCRAPE_TOKEN>`, the static credential of the
+    metrics scraper. The `Token` scheme is left alone by JWT authentication, so no user is authenticated.
+    """
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_SCRAPE_TOKEN
+        if not token:
+            return False
+
+        scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return scheme == 'Token' and hmac.compare_digest(credentials.encode(), token.encode())
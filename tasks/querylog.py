@@ -0,0 +1,109 @@
+# Standard library imports
+import contextvars
+import logging
+import time
+from collections import Counter
+
+# Django imports
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('tasks.slow_queries')
+
+
+class QueryScope:
+    """
+    Collects the query shapes executed while serving one request or running one Celery task.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.shapes = Counter()
+
+
+_current_scope = contextvars.ContextVar('query_scope', default=None)
+_explaining = contextvars.ContextVar('explaining', default=False)
+_task_scope_tokens = {}
+
+
+def get_current_scope():
+    return _current_scope.get()
+
+
+def begin_scope(label):
+    """
+    Starts collecting queries under `label`, e.g. a view or Celery task name.
+    """
+    return _current_scope.set(QueryScope(label))
+
+
+def end_scope(token):
+    """
+    Stops the scope started with `token` and reports query shapes repeated often enough to suggest N+1 access.
+    """
+    scope = _current_scope.get()
+    _current_scope.reset(token)
+
+    if scope is None:
+        return
+
+    for sql, count in scope.shapes.items():
+        if count >= settings.SLOW_QUERY_REPEAT_THRESHOLD:
+            logger.warning(f'Query shape repeated {count} times in {scope.label} (possible N+1): {sql}')
+
+
+def explain(connection, sql, params):
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'unavailable ({str(e)})'
+    finally:
+        _explaining.reset(token)
+
+
+def log_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper that records query shapes and logs queries slower than `SLOW_QUERY_THRESHOLD_MS`
+    along with their query plan.
+    """
+    if _explaining.get():
+        return execute(sql, params, many, context)
+
+    start_time = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.shapes[sql] += 1
+
+    if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        label = scope.label if scope is not None else 'unknown'
+        message = f'Slow query ({elapsed_ms:.1f} ms) in {label}: {sql} - params: {params}'
+
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            message += f'\nQuery plan:\n{explain(context["connection"], sql, params)}'
+        logger.warning(message)
+
+    return result
+
+
+@receiver(connection_created)
+def install_query_logger(sender, connection, **kwargs):
+    if settings.SLOW_QUERY_LOG_ENABLED and log_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_query)
+
+
+# Connected to Celery's task signals in `task_management.celery`, so that web processes do not import Celery.
+def begin_task_scope(task_id=None, task=None, **kwargs):
+    _task_scope_tokens[task_id] = begin_scope(task.name)
+
+
+def end_task_scope(task_id=None, **kwargs):
+    token = _task_scope_tokens.pop(task_id, None)
+    if token is not None:
+        end_scope(token)
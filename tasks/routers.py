@@ -0,0 +1,38 @@
+# Django imports
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+# Local imports
+from .sharding import USER_SHARDED_MODELS, shard_for_user
+
+
+class UserShardRouter:
+    """
+    Routes user-scoped task models to the shard of their user and everything else to the primary database.
+
+    Queries without a model instance to route by cannot be sent to a shard, so task queries select their
+    database explicitly through `UserShardedQuerySet.for_user`.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in USER_SHARDED_MODELS:
+            return 'default'
+
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return shard_for_user(instance.pk)
+        if getattr(instance, 'user_id', None) is not None:
+            return shard_for_user(instance.user_id)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Tasks on a shard reference users on the primary database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if f'{app_label}.{model_name}' in USER_SHARDED_MODELS:
+            return db in settings.TASK_SHARDS
+        return db == 'default'
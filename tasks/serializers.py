@@ -1,8 +1,17 @@
+# Standard library imports
+import re
+
+# Django imports
+from django.utils import timezone
+
 # Third-party imports
+from dateutil.rrule import DAILY, rrule, rrulestr
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
 # Local imports
 from .models import Task, User
+from .tokens import RedisRefreshToken
 from .utils import truncate_to_minute
 
 
@@ -37,6 +46,57 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class TaskSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Limit the output to a sparse fieldset, e.g. the one requested through `?fields=`.
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    @classmethod
+    def get_requested_fields(cls, fields_param):
+        """
+        Parses a comma separated `fields_param` into a tuple of field names in `Meta.fields` order.
+
+        Returns `None` when no selection was requested. The `id` field is always included.
+        """
+        if not fields_param:
+            return None
+
+        requested_fields = {'id'} | {name.strip() for name in fields_param.split(',') if name.strip()}
+        unknown_fields = requested_fields - set(cls.Meta.fields)
+
+        if unknown_fields:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown_fields))}."})
+
+        return tuple(name for name in cls.Meta.fields if name in requested_fields)
+
+    def validate_recurrence(self, value):
+        value = value.strip()
+        if not value:
+            return value
+
+        # Only a single rule is accepted; the series starts at its due date.
+        try:
+            rule = rrulestr(value, dtstart=timezone.now())
+        except (ValueError, TypeError):
+            raise serializers.ValidationError('Enter a valid RRULE, e.g. "FREQ=WEEKLY;BYDAY=MO".')
+
+        if not isinstance(rule, rrule) or 'DTSTART' in value.upper():
+            raise serializers.ValidationError('Enter a single RRULE without DTSTART.')
+
+        # Occurrences are due at the time of day of the series, at most once a day.
+        if rule._freq > DAILY or re.search(r'BY(HOUR|MINUTE|SECOND)\b', value, re.IGNORECASE):
+            raise serializers.ValidationError('Tasks can repeat at most daily, at the time of their due date.')
+
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('recurrence') and self.instance is not None and self.instance.series_id:
+            raise serializers.ValidationError({'recurrence': 'An occurrence of a recurring task cannot recur itself.'})
+        return attrs
+
     def create(self, validated_data):
         due_date = validated_data.pop('due_date', None)
         print(validated_data)
@@ -45,7 +105,10 @@ class TaskSerializer(serializers.ModelSerializer):
             due_date = truncate_to_minute(due_date)
             validated_data['due_date'] = due_date
 
-        return super().create(validated_data)
+        # Save through the instance so that the router places the task on its user's shard.
+        task = Task(**validated_data)
+        task.save()
+        return task
     
     def update(self, instance, validated_data):
         due_date = validated_data.pop('due_date', None)
@@ -54,12 +117,23 @@ class TaskSerializer(serializers.ModelSerializer):
             due_date = truncate_to_minute(due_date)
             validated_data['due_date'] = due_date
 
+        if 'status' in validated_data and validated_data['status'] != instance.status:
+            validated_data['status_changed_at'] = timezone.now()
+
         return super().update(instance, validated_data)
 
     class Meta:
         model = Task
-        fields = ('id', 'title', 'description', 'status', 'due_date', 'created_at', 'updated_at')
-        read_only_fields = ('created_at', 'updated_at')
+        fields = (
+            'id', 'title', 'description', 'status', 'due_date', 'recurrence', 'series', 'occurrence_date',
+            'created_at', 'updated_at'
+        )
+        read_only_fields = ('series', 'occurrence_date', 'created_at', 'updated_at')
+
 
+class RedisTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RedisRefreshToken
 
 
+class RedisTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RedisRefreshToken
@@ -0,0 +1,131 @@
+# Standard library imports
+import math
+import threading
+
+# Django imports
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+# Local imports
+from .constants import CACHE_TASK_SHARD_KEY
+
+# Models stored on the shard of their user (or, for watermarks, on every shard); everything else lives
+# on the primary (`default`) database.
+USER_SHARDED_MODELS = {'tasks.task', 'tasks.tasktombstone', 'tasks.taskdailyrollup', 'tasks.rollupwatermark'}
+
+
+def is_sharded():
+    return settings.TASK_SHARDS != ['default']
+
+
+def shard_for_user(user_id):
+    """
+    Returns the database alias holding the tasks of the user with id `user_id`.
+
+    Users are placed by `user_id % len(TASK_SHARDS)` unless a `ShardAssignment` moved them elsewhere.
+    """
+    if not is_sharded():
+        return 'default'
+
+    cache_key = CACHE_TASK_SHARD_KEY.format(user_id)
+    shard = cache.get(cache_key)
+
+    if shard is None:
+        from .models import ShardAssignment
+
+        assignment = ShardAssignment.objects.filter(user_id=user_id).values_list('shard', flat=True).first()
+        shard = assignment or settings.TASK_SHARDS[user_id % len(settings.TASK_SHARDS)]
+        cache.set(cache_key, shard, timeout=settings.CACHE_TTL)
+
+    return shard
+
+
+# Task ids reserved by this process and not handed out yet, and the end of the last reserved block.
+_id_block = iter(())
+_last_reserved_id = 0
+_id_block_lock = threading.Lock()
+
+
+def _take_ticket():
+    from .models import TaskIdTicket
+
+    with transaction.atomic(using='default'):
+        ticket = TaskIdTicket.objects.using('default').create()
+        ticket_id = ticket.id
+        ticket.delete()
+    return ticket_id
+
+
+def _reserve_id_block(above=0):
+    """
+    Takes the next ticket from the ticket table on the primary database and returns the block of
+    `TASK_ID_BLOCK_SIZE` task ids it reserves: ticket `n` reserves ids `(n - 1) * size + 1` to `n * size`.
+
+    When that block would not start above `above`, the ticket sequence is first moved past it.
+    """
+    from .models import TaskIdTicket
+
+    size = settings.TASK_ID_BLOCK_SIZE
+    ticket_id = _take_ticket()
+
+    if (ticket_id - 1) * size + 1 <= above:
+        # An explicit id moves the sequence on SQLite and MySQL; other backends reset it to the table's maximum.
+        last_ticket_id = math.ceil(above / size)
+        connection = connections['default']
+        with transaction.atomic(using='default'):
+            TaskIdTicket.objects.using('default').create(id=last_ticket_id)
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [TaskIdTicket]):
+                    cursor.execute(sql)
+            TaskIdTicket.objects.using('default').filter(id=last_ticket_id).delete()
+        ticket_id = _take_ticket()
+
+    return range((ticket_id - 1) * size + 1, ticket_id * size + 1)
+
+
+def _replace_id_block(above):
+    global _id_block, _last_reserved_id
+
+    block = _reserve_id_block(above)
+    _id_block = iter(block)
+    _last_reserved_id = block[-1]
+
+
+def allocate_task_id():
+    """
+    Returns a task id unique across all shards.
+
+    Ids are handed out from a block reserved by this process, so the primary database is written once per
+    `TASK_ID_BLOCK_SIZE` tasks. Ids left in a block when the process exits are never used, and ids follow
+    creation order only within a process.
+    """
+    with _id_block_lock:
+        task_id = next(_id_block, None)
+        if task_id is None:
+            # A reservation rolled back with an enclosing transaction issues its ticket again, so a new
+            # block always starts past the previous one.
+            _replace_id_block(above=_last_reserved_id)
+            task_id = next(_id_block)
+    return task_id
+
+
+def seed_task_ids(*aliases):
+    """
+    Moves the ticket sequence past the highest task id stored on the `aliases` databases.
+
+    Tasks written to `default` before sharding was enabled took their ids from its own sequence, so the
+    tickets must start above them or the ids collide once those tasks are moved to a shard. Only the
+    block of this process is replaced, so seed before other processes start creating tasks.
+    """
+    from .models import Task
+
+    highest = 0
+    for alias in aliases:
+        if Task._meta.db_table in connections[alias].introspection.table_names():
+            highest = max(highest, Task.objects.using(alias).aggregate(highest=Max('id'))['highest'] or 0)
+
+    with _id_block_lock:
+        _replace_id_block(above=max(highest, _last_reserved_id))
@@ -0,0 +1,30 @@
+# Django imports
+from django.core.cache import cache
+from django.db.models.signals import post_migrate, pre_delete
+from django.dispatch import receiver
+
+# Local imports
+from .constants import CACHE_TASK_SHARD_KEY
+from .models import User, Task, TaskTombstone, TaskDailyRollup
+from .sharding import is_sharded, seed_task_ids, shard_for_user
+
+
+@receiver(pre_delete, sender=User)
+def delete_user_tasks(sender, instance, **kwargs):
+    """
+    Deletes the user's tasks, tombstones and rollups from their shard, which the database cannot cascade across.
+    """
+    shard = shard_for_user(instance.pk)
+    Task.objects.using(shard).filter(user_id=instance.pk).delete()
+    TaskTombstone.objects.using(shard).filter(user_id=instance.pk).delete()
+    TaskDailyRollup.objects.using(shard).filter(user_id=instance.pk).delete()
+    cache.delete(CACHE_TASK_SHARD_KEY.format(instance.pk))
+
+
+@receiver(post_migrate)
+def seed_task_id_tickets(sender, using, **kwargs):
+    """
+    Starts the task id tickets above the existing tasks when the databases are migrated for sharding.
+    """
+    if sender.name == 'tasks' and is_sharded():
+        seed_task_ids(*{'default', using})
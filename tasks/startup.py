@@ -0,0 +1,88 @@
+# Standard library imports
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Django imports
+from django.conf import settings
+
+# Code run by a fresh interpreter to start each entry point the way its process does on boot.
+ENTRY_POINTS = {
+    # Application loading, middleware and the URLconf, which is otherwise imported on the first request.
+    'web': (
+        'import task_management.wsgi\n'
+        'from django.urls import get_resolver\n'
+        'get_resolver().url_patterns\n'
+    ),
+    # What `celery -A task_management worker` imports before consuming: Django setup, model checks and tasks.
+    'celery': (
+        'from task_management.celery import app\n'
+        'app.loader.import_default_modules()\n'
+    ),
+}
+
+# `-X importtime` only reports imports made through the import statement, so `importlib.import_module`,
+# which Django and Celery use to load apps, models and task modules, is routed through `__import__`.
+_SCRIPT = '''
+import importlib, json, sys, time
+
+def import_module(name, package=None):
+    if name.startswith('.'):
+        name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+
+importlib.import_module = import_module
+started_at = time.perf_counter()
+{code}
+print(json.dumps({{'seconds': time.perf_counter() - started_at, 'modules': len(sys.modules)}}))
+'''
+
+_IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def measure_startup(entry_point):
+    """
+    Starts `entry_point` in a fresh interpreter and returns its cold start cost as
+    `{'seconds': ..., 'modules': ..., 'imports': [(module, self_us, cumulative_us, depth), ...]}`.
+
+    `seconds` is the wall time spent starting the entry point and `modules` the size of `sys.modules`
+    afterwards. `imports` lists every imported module in `-X importtime` order.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _SCRIPT.format(code=ENTRY_POINTS[entry_point])],
+        capture_output=True,
+        text=True,
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE},
+    )
+
+    if result.returncode:
+        raise RuntimeError(f"Starting the {entry_point} entry point failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            imports.append((match[4], int(match[1]), int(match[2]), len(match[3]) // 2))
+
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    profile['imports'] = imports
+    return profile
+
+
+def check_budget(entry_point, profile):
+    """
+    Returns the ways `profile` exceeds the entry point's `STARTUP_IMPORT_BUDGET`, if any.
+
+    Only the number of loaded modules is checked; the wall time varies with the machine and its load.
+    """
+    budget = settings.STARTUP_IMPORT_BUDGET[entry_point]
+    problems = []
+
+    if profile['modules'] > budget:
+        problems.append(f"{entry_point} imported {profile['modules']} modules, budget is {budget}")
+
+    return problems
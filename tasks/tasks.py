@@ -1,10 +1,16 @@
 # Standard library imports
 import logging
 import sys
+from collections import Counter, defaultdict
 from datetime import timedelta
+from itertools import groupby
 
 # Django imports
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
 from django.template.loader import render_to_string
 from django.utils import timezone
 
@@ -13,53 +19,124 @@ from celery import shared_task
 from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 
 # Local imports
-from .constants import SUBJECT_TASK_DUE
-from .models import Task
+# Web processes no longer load the Celery app at startup, so load it before any task here is sent.
+from task_management.celery import app  # noqa: F401
+from .constants import SUBJECT_TASK_DUE, ROLLUP_WATERMARK_NAME
+from .models import User, Task, TaskTombstone, TaskDailyRollup, RollupWatermark
+from .telemetry import increment_counter
 from .utils import truncate_to_minute
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def send_due_task_emails():
+
+def build_plain_text_message(tasks):
     """
-    Sends email notifications for tasks due soon.
+    Builds the plain-text body of a due task reminder listing `tasks`.
+    """
+    task_lines = ''.join(
+        f"\nTitle: {task.title}\nDue Date: {task.due_date}\nStatus: {task.status}\n"
+        for task in tasks
+    )
+    return f"Tasks Due Soon\n{task_lines}"
 
-    Retrieves tasks due within 5 and 10 minutes from now and sends an email notification
-    to the assigned user.
 
+def send_per_task_emails(due_tasks):
     """
-    try:
-        logger.info('Into send_due_task_emails')
-        now = truncate_to_minute(timezone.now())
-        five_minutes_later = now + timedelta(minutes=5)
-        ten_minutes_later = now + timedelta(minutes=10)
+    Sends one reminder email per due task.
+    """
+    for task in due_tasks:
+        html_message = render_to_string('tasks/due_tasks_email.html', {
+            'tasks': [task],
+        })
 
-        due_tasks = Task.objects.select_related('user').filter(
-            due_date__in=[five_minutes_later, ten_minutes_later]
+        task.user.email_user(
+            SUBJECT_TASK_DUE,
+            build_plain_text_message([task]),
+            settings.EMAIL_HOST_USER,
+            html_message=html_message,
+            fail_silently=False,
         )
 
-        for task in due_tasks:
-            plain_text_message = f"""
-                Tasks Due Soon
+        logger.info(f"Email sent for task {task.id}")
+        increment_counter('emails_sent')
+
 
-                Title: {task.title}
-                Due Date: {task.due_date}
-                Status: {task.status}
-            """
+def send_digest_emails(due_tasks):
+    """
+    Sends one reminder email per user and due time, listing all of that user's tasks due then.
+
+    `due_tasks` must be ordered by user and due date. All messages share a single SMTP connection.
+    """
+    with get_connection() as connection:
+        for (_, due_date), group in groupby(due_tasks, key=lambda task: (task.user_id, task.due_date)):
+            tasks = list(group)
+            user = tasks[0].user
 
             html_message = render_to_string('tasks/due_tasks_email.html', {
-                'task': task,
+                'tasks': tasks,
             })
-            
-            task.user.email_user(
+
+            message = EmailMultiAlternatives(
                 SUBJECT_TASK_DUE,
-                plain_text_message,
+                build_plain_text_message(tasks),
                 settings.EMAIL_HOST_USER,
-                html_message=html_message,
-                fail_silently=False,
+                [user.email],
+                connection=connection,
             )
+            message.attach_alternative(html_message, 'text/html')
+            message.send()
+
+            logger.info(f"Digest email sent to user {user.id} for {len(tasks)} tasks due at {due_date}")
+            increment_counter('emails_sent')
+            increment_counter('tasks_notified', len(tasks))
+
+
+def get_due_tasks(shard, due_dates):
+    """
+    Returns the tasks on `shard` due at one of `due_dates`, ordered by user and due date, including the
+    occurrences of recurring tasks that have not been materialized.
+
+    Users live on the primary database, so they are loaded with one extra query instead of a join. Occurrences
+    are due at the time of day of their series, so only the series due at one of those times are expanded.
+    """
+    tasks = Task.objects.using(shard)
+    due_tasks = list(tasks.filter(recurrence='', is_cancelled=False, due_date__in=due_dates))
+    series = tasks.filter(due_date__time__in={timezone.localtime(due_date).time() for due_date in due_dates})
+    due_tasks += [
+        occurrence for occurrence in series.expand_occurrences(min(due_dates), max(due_dates))
+        if occurrence.due_date in due_dates
+    ]
+    due_tasks.sort(key=lambda task: (task.user_id, task.due_date, task.id or task.series_id))
+    users = User.objects.in_bulk({task.user_id for task in due_tasks})
+
+    for task in due_tasks:
+        task.user = users[task.user_id]
+
+    return due_tasks
+
+
+@shared_task
+def send_due_task_emails():
+    """
+    Sends email notifications for tasks due soon.
+
+    Retrieves tasks due within 5 and 10 minutes from now on every shard and notifies their users, either
+    with one digest per user and due time or with one email per task, depending on `DUE_TASK_EMAIL_MODE`.
+
+    """
+    try:
+        logger.info('Into send_due_task_emails')
+        now = truncate_to_minute(timezone.now())
+        five_minutes_later = now + timedelta(minutes=5)
+        ten_minutes_later = now + timedelta(minutes=10)
+
+        for shard in settings.TASK_SHARDS:
+            due_tasks = get_due_tasks(shard, [five_minutes_later, ten_minutes_later])
 
-            logger.info(f"Email sent for task {task.id}")
+            if settings.DUE_TASK_EMAIL_MODE == 'digest':
+                send_digest_emails(due_tasks)
+            else:
+                send_per_task_emails(due_tasks)
 
     except Exception as e:
         _, __, tb = sys.exc_info()
@@ -79,10 +156,119 @@ def expired_tokens_cleanup():
 
         expired_tokens = OutstandingToken.objects.filter(expires_at__lt=now).iterator()
 
+        purged = 0
         for token in expired_tokens:
             BlacklistedToken.objects.create(token=token.token)
             token.delete()
+            purged += 1
+
+        increment_counter('tokens_purged', purged)
+
+    except Exception as e:
+        _, __, tb = sys.exc_info()
+        logger.error(f"Error in expired_tokens_cleanup: {str(e)} at lineno: {tb.tb_lineno}")
+
+
+@shared_task
+def tombstones_cleanup():
+    """
+    Deletes task tombstones older than the retention window from every shard.
+
+    Clients whose sync watermark predates the window are asked to perform a full resync instead.
+    """
+    try:
+        logger.info('Into tombstones_cleanup')
+        cutoff = timezone.now() - settings.TOMBSTONE_RETENTION
+
+        for shard in settings.TASK_SHARDS:
+            deleted, _ = TaskTombstone.objects.using(shard).filter(deleted_at__lt=cutoff).delete()
+            logger.info(f"Deleted {deleted} tombstones from {shard}")
+            increment_counter('tombstones_purged', deleted)
+
+    except Exception as e:
+        _, __, tb = sys.exc_info()
+        logger.error(f"Error in tombstones_cleanup: {str(e)} at lineno: {tb.tb_lineno}")
+
+
+def update_shard_rollups(shard):
+    """
+    Folds the task changes on `shard` since its watermark into the daily rollups.
+
+    Only tasks updated after the watermark are scanned, except for overdue tasks, which are found through
+    the `due_date` index. Tasks are counted on the day of `created_at` (created), `status_changed_at`
+    (status changes and completions) and `due_date` (overdue). A task whose status changes more than once
+    between two runs is counted once, and a task created with a past due date is counted overdue by the
+    run that picks up its creation. Recurring tasks are left out of the overdue counts: a series row is
+    not a task of its own, and its occurrences are only counted once materialized. Returns the number of
+    rollup rows touched.
+
+    Timestamps are set before a write commits, so each run stops `ROLLUP_WATERMARK_LAG` behind now and
+    stores that as the next watermark.
+    """
+    until = timezone.now() - settings.ROLLUP_WATERMARK_LAG
+
+    with transaction.atomic(using=shard):
+        watermark, _ = RollupWatermark.objects.using(shard).select_for_update().get_or_create(
+            name=ROLLUP_WATERMARK_NAME
+        )
+        since = watermark.value
+
+        changed_tasks = Task.objects.using(shard)
+        if since is not None:
+            changed_tasks = changed_tasks.filter(updated_at__gt=since)
+        # Tasks created after `until` are left to the run that picks up their creation.
+        overdue_tasks = Task.objects.using(shard).filter(
+            recurrence='', is_cancelled=False, created_at__lte=until
+        ).exclude(status='completed')
+
+        def window(field):
+            bounds = {f'{field}__lte': until}
+            if since is not None:
+                bounds[f'{field}__gt'] = since
+            return bounds
+
+        counted_tasks = [
+            ('created', changed_tasks.filter(**window('created_at')), 'created_at'),
+            ('status_changes', changed_tasks.filter(**window('status_changed_at')), 'status_changed_at'),
+            ('completed', changed_tasks.filter(status='completed', **window('status_changed_at')), 'status_changed_at'),
+            ('overdue', overdue_tasks.filter(**window('due_date')), 'due_date'),
+        ]
+        if since is not None:
+            # Tasks created already overdue, whose due dates are behind the watermark.
+            counted_tasks.append(('overdue', overdue_tasks.filter(created_at__gt=since, due_date__lte=since), 'due_date'))
+
+        deltas = defaultdict(Counter)
+        for counter, tasks, field in counted_tasks:
+            rows = tasks.annotate(day=TruncDate(field)).values('user_id', 'day').annotate(count=Count('id'))
+            for row in rows:
+                deltas[(row['user_id'], row['day'])][counter] += row['count']
+
+        for (user_id, day), counts in deltas.items():
+            updated = TaskDailyRollup.objects.using(shard).filter(user_id=user_id, day=day).update(
+                **{name: F(name) + count for name, count in counts.items()}
+            )
+            if not updated:
+                TaskDailyRollup.objects.using(shard).create(user_id=user_id, day=day, **counts)
+
+        watermark.value = until
+        watermark.save(update_fields=['value'])
+
+    return len(deltas)
+
+
+@shared_task
+def update_task_rollups():
+    """
+    Updates the per-user daily task rollups on every shard with the changes since the last run.
+    """
+    try:
+        logger.info('Into update_task_rollups')
+
+        for shard in settings.TASK_SHARDS:
+            updated = update_shard_rollups(shard)
+            logger.info(f"Updated {updated} rollups on {shard}")
+            increment_counter('rollups_updated', updated)
 
     except Exception as e:
         _, __, tb = sys.exc_info()
-        logger.error(f"Error in expired_tokens_cleanup: {str(e)} at lineno: {tb.tb_lineno}")
\ No newline at end of file
+        logger.error(f"Error in update_task_rollups: {str(e)} at lineno: {tb.tb_lineno}")
@@ -0,0 +1,187 @@
+# Standard library imports
+import logging
+import time
+
+# Third-party imports
+from celery import current_task
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = 'celery_metrics:{}'
+METRICS_TASKS_KEY = 'celery_metrics:tasks'
+RUNNING_KEY = 'celery_running:{}'
+PUBLISHED_AT_HEADER = 'telemetry_published_at'
+
+# Upper bounds (in seconds) of the latency and runtime histogram buckets.
+HISTOGRAM_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, float('inf'))
+
+# Running executions are tracked per task id; one left behind by a crashed worker stops counting after
+# this many seconds.
+RUNNING_TTL = 60 * 60
+
+_started_at = {}
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _incr(task_name, field, amount=1):
+    pipeline = _redis().pipeline()
+    pipeline.sadd(METRICS_TASKS_KEY, task_name)
+    pipeline.hincrby(METRICS_KEY.format(task_name), field, amount)
+    pipeline.execute()
+
+
+def _observe(task_name, histogram, value):
+    pipeline = _redis().pipeline()
+    key = METRICS_KEY.format(task_name)
+    pipeline.sadd(METRICS_TASKS_KEY, task_name)
+    pipeline.hincrbyfloat(key, f'{histogram}_sum', value)
+    pipeline.hincrby(key, f'{histogram}_count', 1)
+    for bound in HISTOGRAM_BUCKETS:
+        if value <= bound:
+            pipeline.hincrby(key, f'{histogram}_bucket_{bound}', 1)
+    pipeline.execute()
+
+
+def increment_counter(name, amount=1):
+    """
+    Adds `amount` to the counter `name` of the Celery task currently executing, e.g. emails sent.
+    """
+    if not current_task or not current_task.name:
+        return
+
+    try:
+        _incr(current_task.name, f'counter_{name}', amount)
+    except Exception as e:
+        logger.warning(f"Could not record counter {name}: {str(e)}")
+
+
+@before_task_publish.connect
+def record_publish(sender=None, headers=None, **kwargs):
+    try:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+        _incr(sender, 'published')
+    except Exception as e:
+        logger.warning(f"Could not record publish of {sender}: {str(e)}")
+
+
+@task_prerun.connect
+def record_start(task_id=None, task=None, **kwargs):
+    try:
+        now = time.time()
+        _started_at[task_id] = now
+        _incr(task.name, 'started')
+
+        published_at = task.request.get(PUBLISHED_AT_HEADER)
+        if published_at is not None:
+            _observe(task.name, 'latency', max(now - published_at, 0))
+
+        running_key = RUNNING_KEY.format(task.name)
+        pipeline = _redis().pipeline()
+        pipeline.zremrangebyscore(running_key, '-inf', now - RUNNING_TTL)
+        pipeline.zadd(running_key, {task_id: now})
+        pipeline.zcard(running_key)
+        pipeline.expire(running_key, RUNNING_TTL)
+        _, _, running, _ = pipeline.execute()
+
+        if running > 1:
+            _incr(task.name, 'overlaps')
+            logger.warning(f"{task.name} started while {running - 1} other execution(s) are still running")
+    except Exception as e:
+        logger.warning(f"Could not record start of {task_id}: {str(e)}")
+
+
+@task_postrun.connect
+def record_finish(task_id=None, task=None, state=None, **kwargs):
+    try:
+        started_at = _started_at.pop(task_id, None)
+        if started_at is not None:
+            _observe(task.name, 'runtime', time.time() - started_at)
+
+        _redis().zrem(RUNNING_KEY.format(task.name), task_id)
+        if state == 'SUCCESS':
+            _incr(task.name, 'succeeded')
+    except Exception as e:
+        logger.warning(f"Could not record finish of {task_id}: {str(e)}")
+
+
+@task_failure.connect
+def record_failure(sender=None, task_id=None, **kwargs):
+    try:
+        _incr(sender.name, 'failed')
+    except Exception as e:
+        logger.warning(f"Could not record failure of {task_id}: {str(e)}")
+
+
+def get_metrics():
+    """
+    Returns the recorded metrics as `{task_name: {field: value}}`, including the current running count.
+    """
+    redis = _redis()
+    metrics = {}
+
+    for task_name in sorted(name.decode() for name in redis.smembers(METRICS_TASKS_KEY)):
+        fields = redis.hgetall(METRICS_KEY.format(task_name))
+        task_metrics = {field.decode(): float(value) for field, value in fields.items()}
+        task_metrics['running'] = redis.zcount(RUNNING_KEY.format(task_name), time.time() - RUNNING_TTL, '+inf')
+        metrics[task_name] = task_metrics
+
+    return metrics
+
+
+def reset_metrics():
+    redis = _redis()
+    task_names = [name.decode() for name in redis.smembers(METRICS_TASKS_KEY)]
+    keys = [METRICS_KEY.format(name) for name in task_names] + [RUNNING_KEY.format(name) for name in task_names]
+    redis.delete(METRICS_TASKS_KEY, *keys)
+
+
+def render_prometheus(metrics):
+    """
+    Renders `metrics` in the Prometheus text exposition format.
+    """
+    lines = []
+
+    def family(name, metric_type, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+
+    for field, help_text in (
+        ('published', 'Tasks published to the broker.'),
+        ('started', 'Task executions started.'),
+        ('succeeded', 'Task executions that succeeded.'),
+        ('failed', 'Task executions that raised an exception.'),
+        ('overlaps', 'Executions started while another execution of the same task was running.'),
+    ):
+        family(f'celery_task_{field}_total', 'counter', help_text)
+        for task_name, task_metrics in metrics.items():
+            lines.append(f'celery_task_{field}_total{{task="{task_name}"}} {task_metrics.get(field, 0):g}')
+
+    family('celery_task_running', 'gauge', 'Executions currently running.')
+    for task_name, task_metrics in metrics.items():
+        lines.append(f'celery_task_running{{task="{task_name}"}} {task_metrics["running"]}')
+
+    for histogram, name, help_text in (
+        ('latency', 'celery_task_queue_latency_seconds', 'Time between publishing a task and starting it.'),
+        ('runtime', 'celery_task_runtime_seconds', 'Time spent executing a task.'),
+    ):
+        family(name, 'histogram', help_text)
+        for task_name, task_metrics in metrics.items():
+            for bound in HISTOGRAM_BUCKETS:
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                count = task_metrics.get(f'{histogram}_bucket_{bound}', 0)
+                lines.append(f'{name}_bucket{{task="{task_name}",le="{le}"}} {count:g}')
+            lines.append(f'{name}_sum{{task="{task_name}"}} {task_metrics.get(f"{histogram}_sum", 0):g}')
+            lines.append(f'{name}_count{{task="{task_name}"}} {task_metrics.get(f"{histogram}_count", 0):g}')
+
+    family('celery_task_counter_total', 'counter', 'Task-specific counters such as emails sent or tokens purged.')
+    for task_name, task_metrics in metrics.items():
+        for field, value in task_metrics.items():
+            if field.startswith('counter_'):
+                lines.append(f'celery_task_counter_total{{task="{task_name}",counter="{field[8:]}"}} {value:g}')
+
+    return '\n'.join(lines) + '\n'
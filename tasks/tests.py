@@ -1,3 +1,848 @@
-from django.test import TestCase
+# Standard library imports
+import asyncio
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import uuid
+from io import StringIO
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+# Django imports
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail, signing
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+# Third-party imports
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+# Local imports
+from .constants import PROFILER_TOKEN_SALT, RESPONSE_401
+from .events import TaskEventHub
+from .middleware import QueryScopeMiddleware, RequestElapsedTimeMiddleware, RequestProfilerMiddleware
+from .models import User, Task, TaskTombstone, TaskDailyRollup, RollupWatermark
+from .querylog import begin_scope, end_scope
+from .sharding import allocate_task_id, is_sharded, seed_task_ids, shard_for_user
+from .startup import check_budget, measure_startup
+from .tasks import get_due_tasks, send_due_task_emails, update_shard_rollups
+from .telemetry import METRICS_KEY, RUNNING_KEY, RUNNING_TTL, get_metrics, record_finish, record_start
+from .tokens import RedisRefreshToken, is_token_revoked
+from .utils import invalidate_task_list, parse_aware_datetime
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def redis_available():
+    try:
+        return get_redis_connection('default').ping()
+    except Exception:
+        return False
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaskAPITestCase(TestCase):
+    """
+    Base class for API tests: an authenticated client and an empty in-memory cache.
+    """
+    databases = {'default', *settings.TASK_SHARDS}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_task(self, **data):
+        response = self.client.post('/api/tasks/', {'title': 'Task', **data}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+
+class TokenRevocationTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def refresh(self, refresh_token):
+        return self.client.post('/api/token/refresh/', {'refresh': refresh_token}, format='json')
+
+    def test_rotated_refresh_tokens_are_revoked_without_database_writes(self):
+        tokens = self.client.post('/api/login/', {'username': 'alice', 'password': 'password'}, format='json').data
+
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], tokens['refresh'])
+
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    def test_migrate_blacklist_to_redis(self):
+        revoked, expired = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        revoked.blacklist()
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        call_command('migrate_blacklist_to_redis', '--purge', stdout=StringIO())
+
+        self.assertTrue(is_token_revoked(revoked['jti']))
+        self.assertFalse(is_token_revoked(expired['jti']))
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(self.refresh(str(revoked)).status_code, 401)
+
+        # Tokens issued by the new backend are not revoked by the migration.
+        self.assertEqual(self.refresh(str(RedisRefreshToken.for_user(self.user))).status_code, 200)
+
+
+class TaskListViewTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tasks = [self.create_task(title=f'Task {index}') for index in range(7)]
+        cache.clear()
+
+    def test_pages_and_sparse_fieldsets(self):
+        first_page = self.client.get('/api/tasks/').data
+        self.assertEqual(first_page['count'], 7)
+        self.assertEqual([task['id'] for task in first_page['results']], [task['id'] for task in self.tasks[:5]])
+
+        second_page = self.client.get('/api/tasks/', {'page': 2, 'fields': 'title'}).data
+        self.assertEqual(second_page['results'], [{'id': task['id'], 'title': task['title']} for task in self.tasks[5:]])
+        self.assertIsNone(second_page['next'])
+
+        self.assertEqual(self.client.get('/api/tasks/', {'fields': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/', {'page': 9}).status_code, 404)
+
+    def test_cached_page_links_follow_the_request(self):
+        sparse = self.client.get('/api/tasks/', {'fields': 'title'}).data
+        self.assertEqual(sparse['next'], 'http://testserver/api/tasks/?fields=title&page=2')
+
+        plain = self.client.get('/api/tasks/').data
+        self.assertEqual(plain['next'], 'http://testserver/api/tasks/?page=2')
+
+        self.client.get('/api/tasks/', {'page': 2})
+        self.assertEqual(self.client.get('/api/tasks/', {'page': 2, 'fields': 'title'}).data['previous'], 'http://testserver/api/tasks/?fields=title')
+
+    def task_queries(self, *requests):
+        with CaptureQueriesContext(connections[shard_for_user(self.user.id)]) as queries:
+            for url, params in requests:
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+        return [query['sql'] for query in queries if 'tasks_task' in query['sql']]
+
+    def test_sparse_misses_read_only_the_requested_columns(self):
+        task_url = f"/api/tasks/{self.tasks[0]['id']}/"
+        sparse_requests = [('/api/tasks/', {'fields': 'title'}), (task_url, {'fields': 'title'})]
+
+        # The cold page, then the cached page whose tasks are loaded by id, then the detail.
+        queries = self.task_queries(sparse_requests[0], *sparse_requests)
+
+        self.assertEqual(len(queries), 4)
+        self.assertTrue(all('"description"' not in sql for sql in queries))
+        # Sparse rows are not cached, so the same requests read the database again.
+        self.assertEqual(len(self.task_queries(*sparse_requests)), 2)
+
+    def test_sparse_reads_use_the_task_cache(self):
+        self.client.get('/api/tasks/')
+        self.client.get(f"/api/tasks/{self.tasks[0]['id']}/")
+        invalidate_task_list(self.user.id)
+
+        # Only the page itself is rebuilt, with the requested columns.
+        response = self.client.get('/api/tasks/', {'fields': 'title,status'})
+        self.assertEqual(response.data['results'][0], {'id': self.tasks[0]['id'], 'title': 'Task 0', 'status': 'draft'})
+
+        self.assertFalse(self.task_queries(
+            ('/api/tasks/', {'fields': 'title'}), (f"/api/tasks/{self.tasks[0]['id']}/", {'fields': 'status'})
+        ))
+
+    def test_deleted_tasks_are_skipped_on_cached_pages(self):
+        self.client.get('/api/tasks/')
+        Task.objects.for_user(self.user).filter(pk=self.tasks[0]['id']).delete()
+        cache.delete(f"task_{self.user.id}_{self.tasks[0]['id']}")
+
+        results = self.client.get('/api/tasks/').data['results']
+        self.assertEqual([task['id'] for task in results], [task['id'] for task in self.tasks[1:5]])
+
+
+class TaskCacheTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = self.create_task(title='Cached')
+        self.other_task = self.create_task(title='Other')
+
+    def assert_no_task_queries(self, url):
+        with CaptureQueriesContext(connections[shard_for_user(self.user.id)]) as queries:
+            response = self.client.get(url)
+        self.assertFalse([query for query in queries if 'tasks_task' in query['sql']])
+        return response.data
+
+    def test_detail_reads_are_cache_hits(self):
+        cache.clear()
+        self.client.get(f"/api/tasks/{self.task['id']}/")
+
+        self.assertEqual(self.assert_no_task_queries(f"/api/tasks/{self.task['id']}/")['title'], 'Cached')
+
+    def test_editing_a_task_keeps_the_list_cached(self):
+        self.client.get('/api/tasks/')
+        self.client.patch(f"/api/tasks/{self.task['id']}/", {'title': 'Edited'}, format='json')
+
+        results = self.assert_no_task_queries('/api/tasks/')['results']
+        self.assertEqual([task['title'] for task in results], ['Edited', 'Other'])
+        self.assertEqual(self.assert_no_task_queries(f"/api/tasks/{self.task['id']}/")['title'], 'Edited')
+
+    def test_deleting_a_task_evicts_it(self):
+        self.client.get('/api/tasks/')
+        self.client.delete(f"/api/tasks/{self.task['id']}/")
+
+        self.assertEqual(self.client.get(f"/api/tasks/{self.task['id']}/").status_code, 404)
+        self.assertEqual([task['id'] for task in self.client.get('/api/tasks/').data['results']], [self.other_task['id']])
+
+
+class TaskSyncViewTests(TaskAPITestCase):
+    def sync(self, since):
+        return self.client.get('/api/tasks/sync/', {'since': since.isoformat()})
+
+    def test_invalid_since(self):
+        self.assertEqual(self.client.get('/api/tasks/sync/', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/sync/').status_code, 400)
+
+    def test_since_older_than_tombstone_retention(self):
+        since = timezone.now() - settings.TOMBSTONE_RETENTION - timedelta(minutes=1)
+        self.assertEqual(self.sync(since).status_code, 410)
+
+    def test_returns_changed_and_deleted_tasks(self):
+        since = timezone.now() - timedelta(minutes=1)
+        kept = self.create_task(title='Kept')
+        deleted = self.create_task(title='Deleted')
+        self.client.delete(f"/api/tasks/{deleted['id']}/")
+
+        response = self.sync(since)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['id'] for task in response.data['changed']], [kept['id']])
+        self.assertEqual(response.data['deleted'], [deleted['id']])
+        self.assertTrue(TaskTombstone.objects.for_user(self.user).filter(task_id=deleted['id']).exists())
+
+    def test_watermark_lags_behind_recent_writes(self):
+        since = timezone.now() - timedelta(minutes=1)
+        task = self.create_task()
+
+        watermark = self.sync(since).data['watermark']
+
+        # A write that commits after the query may carry an `updated_at` before the query ran, so changes
+        # within the lag are returned again by the next sync.
+        self.assertLessEqual(watermark, timezone.now() - settings.SYNC_WATERMARK_LAG)
+        self.assertEqual([changed['id'] for changed in self.sync(watermark).data['changed']], [task['id']])
+
+    def test_late_commit_is_not_skipped(self):
+        since = timezone.now() - timedelta(minutes=1)
+        watermark = self.sync(since).data['watermark']
+
+        # Simulates a write stamped before the previous sync but committed after it.
+        task = self.create_task()
+        Task.objects.for_user(self.user).filter(pk=task['id']).update(updated_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual([changed['id'] for changed in self.sync(watermark).data['changed']], [task['id']])
+
+
+class RecurringTaskTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.end = self.start + timedelta(days=4)
+        self.series = self.create_task(title='Standup', due_date=self.start.isoformat(), recurrence='FREQ=DAILY')
+
+    def window(self, start=None, end=None):
+        start, end = start or self.start, end or self.end
+        return self.client.get('/api/tasks/', {'start': start.isoformat(), 'end': end.isoformat()})
+
+    def occurrence_url(self, occurrence_date):
+        return f"/api/tasks/{self.series['id']}/occurrences/{occurrence_date.isoformat()}/"
+
+    def test_rejects_rules_repeating_more_than_daily(self):
+        for recurrence in ('FREQ=HOURLY', 'FREQ=SECONDLY', 'FREQ=DAILY;BYHOUR=9,17', 'FREQ=DAILY;BYMINUTE=0,30'):
+            response = self.client.post('/api/tasks/', {'title': 'Task', 'recurrence': recurrence}, format='json')
+            self.assertEqual(response.status_code, 400, recurrence)
+            self.assertIn('recurrence', response.data)
+
+        self.create_task(recurrence='FREQ=WEEKLY;BYDAY=MO,TH')
+
+    def test_window_expands_occurrences(self):
+        one_off = self.create_task(due_date=(self.start + timedelta(hours=1)).isoformat())
+
+        page = self.window().data
+
+        self.assertEqual(page['count'], 6)
+        self.assertEqual([task['id'] for task in page['results'][:2]], [None, one_off['id']])
+        self.assertEqual(
+            [task['occurrence_date'] for task in page['results'] if task['series']],
+            [(self.start + timedelta(days=offset)).isoformat() for offset in range(4)],
+        )
+
+    def test_materialize_and_delete_occurrence(self):
+        occurrence_date = self.start + timedelta(days=2)
+
+        response = self.client.patch(self.occurrence_url(occurrence_date), {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        occurrence = response.data
+        self.assertEqual((occurrence['series'], occurrence['status']), (self.series['id'], 'completed'))
+        self.assertEqual(self.client.patch(self.occurrence_url(occurrence_date), {'title': 'Retro'}, format='json').status_code, 200)
+
+        page = self.window().data
+        self.assertEqual(page['count'], 5)
+        self.assertEqual(page['results'][2]['id'], occurrence['id'])
+
+        since = timezone.now() - timedelta(minutes=1)
+        self.assertEqual(self.client.delete(f"/api/tasks/{occurrence['id']}/").status_code, 204)
+
+        # The cancelled occurrence is neither listed nor expanded again.
+        page = self.window().data
+        self.assertEqual(page['count'], 4)
+        self.assertNotIn(occurrence_date.isoformat(), [task['occurrence_date'] for task in page['results']])
+        self.assertEqual(self.client.get(f"/api/tasks/{occurrence['id']}/").status_code, 404)
+        self.assertEqual(self.client.patch(self.occurrence_url(occurrence_date), {}, format='json').status_code, 404)
+        self.assertEqual(self.client.get('/api/tasks/sync/', {'since': since.isoformat()}).data['deleted'], [occurrence['id']])
+
+    def test_deleting_series_deletes_its_occurrences(self):
+        occurrence = self.client.patch(self.occurrence_url(self.start), {}, format='json').data
+
+        self.client.delete(f"/api/tasks/{self.series['id']}/")
+
+        self.assertFalse(Task.objects.for_user(self.user).exists())
+        self.assertEqual(
+            set(TaskTombstone.objects.for_user(self.user).values_list('task_id', flat=True)),
+            {self.series['id'], occurrence['id']},
+        )
+
+    def test_expansion_is_capped(self):
+        self.create_task(due_date=self.start.isoformat(), recurrence='FREQ=DAILY')
+
+        with override_settings(RECURRENCE_MAX_SERIES_OCCURRENCES=4):
+            self.assertEqual(self.window().status_code, 400)
+        with override_settings(RECURRENCE_MAX_OCCURRENCES=9):
+            self.assertEqual(self.window().status_code, 400)
+        with override_settings(RECURRENCE_MAX_SERIES_OCCURRENCES=5, RECURRENCE_MAX_OCCURRENCES=10):
+            self.assertEqual(self.window().data['count'], 10)
+
+    def test_due_occurrences(self):
+        self.create_task(due_date=(self.start + timedelta(minutes=5)).isoformat(), recurrence='FREQ=DAILY')
+        cancelled = self.client.patch(self.occurrence_url(self.start + timedelta(days=1)), {}, format='json').data
+        self.client.delete(f"/api/tasks/{cancelled['id']}/")
+        shard = shard_for_user(self.user.id)
+
+        due_tasks = get_due_tasks(shard, [self.start + timedelta(days=3), self.start + timedelta(days=3, minutes=10)])
+        self.assertEqual([(task.series_id, task.due_date) for task in due_tasks], [(self.series['id'], self.start + timedelta(days=3))])
+        self.assertEqual(get_due_tasks(shard, [self.start + timedelta(days=1)]), [])
+
+
+@mock.patch.object(TaskEventHub, 'listen', lambda self: asyncio.sleep(3600))
+@override_settings(TASK_EVENTS_LONG_POLL_TIMEOUT=0.1)
+class TaskEventStreamViewTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+
+    def auth_headers(self, user=None):
+        return {'Authorization': f'Bearer {AccessToken.for_user(user or self.user)}'}
+
+    async def test_long_poll_without_events(self):
+        response = await self.async_client.get('/api/tasks/events/', {'mode': 'poll'}, headers=self.auth_headers())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'events': []})
+
+    async def test_missing_or_malformed_token(self):
+        for headers in ({}, {'Authorization': 'Bearer a b'}, {'Authorization': 'Bearer invalid'}):
+            with self.subTest(headers=headers):
+                response = await self.async_client.get('/api/tasks/events/', {'mode': 'poll'}, headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(json.loads(response.content), RESPONSE_401)
+
+    async def test_token_of_deleted_or_inactive_user(self):
+        deleted = await sync_to_async(User.objects.create_user)('bob', 'bob@example.com', 'password')
+        inactive = await sync_to_async(User.objects.create_user)('carol', 'carol@example.com', 'password', is_active=False)
+        headers = self.auth_headers(deleted)
+        await sync_to_async(deleted.delete)()
+
+        for headers in (headers, self.auth_headers(inactive)):
+            response = await self.async_client.get('/api/tasks/events/', {'mode': 'poll'}, headers=headers)
+            self.assertEqual(response.status_code, 401)
+
+    async def test_hub_fans_out_to_user_queues(self):
+        hub = TaskEventHub()
+        first, second = hub.subscribe(self.user.id), hub.subscribe(self.user.id)
+        other = hub.subscribe(self.user.id + 1)
+
+        hub.dispatch(self.user.id, b'{"event": "created"}')
+
+        self.assertEqual([first.get_nowait(), second.get_nowait()], ['{"event": "created"}'] * 2)
+        self.assertTrue(other.empty())
+
+        for user_id, queue in ((self.user.id, first), (self.user.id, second), (self.user.id + 1, other)):
+            hub.unsubscribe(user_id, queue)
+        self.assertIsNone(hub.listener)
+
+
+@override_settings(TASK_EVENTS_RECONNECT_DELAY=0)
+class TaskEventHubTests(SimpleTestCase):
+    async def test_listener_reuses_and_closes_its_redis_client(self):
+        connected = asyncio.Event()
+        pubsub = mock.AsyncMock()
+        pubsub.__aenter__.return_value = pubsub
+        pubsub.psubscribe.side_effect = [ConnectionError('Connection reset'), None]
+
+        async def listen():
+            connected.set()
+            await asyncio.sleep(3600)
+            yield
+
+        pubsub.listen = listen
+        client = mock.Mock(pubsub=mock.Mock(return_value=pubsub), aclose=mock.AsyncMock())
+
+        with mock.patch('redis.asyncio.from_url', return_value=client) as from_url:
+            hub = TaskEventHub()
+            queue = hub.subscribe(self.id())
+            await asyncio.wait_for(connected.wait(), timeout=1)
+            listener = hub.listener
+            hub.unsubscribe(self.id(), queue)
+            with self.assertRaises(asyncio.CancelledError):
+                await listener
+
+        self.assertEqual(from_url.call_count, 1)
+        self.assertEqual(client.pubsub.call_count, 2)
+        client.aclose.assert_awaited_once()
+
+
+class AsyncMiddlewareTests(TaskAPITestCase):
+    def test_middleware_follows_the_mode_of_the_chain(self):
+        async def async_get_response(request):
+            return None
+
+        for middleware_class in (RequestElapsedTimeMiddleware, QueryScopeMiddleware, RequestProfilerMiddleware):
+            with self.subTest(middleware=middleware_class.__name__), override_settings(PROFILER_ENABLED=True):
+                self.assertTrue(middleware_class.async_capable)
+                self.assertTrue(iscoroutinefunction(middleware_class(async_get_response)))
+                self.assertFalse(iscoroutinefunction(middleware_class(lambda request: None)))
+
+    async def test_profiler_captures_sync_views_under_asgi(self):
+        with tempfile.TemporaryDirectory() as profile_dir, override_settings(PROFILER_DIR=profile_dir):
+            response = await AsyncClient().get('/api/tasks/', headers={
+                'Authorization': f'Bearer {AccessToken.for_user(self.user)}',
+                'X-Profile-Token': signing.dumps({'label': 'test'}, salt=PROFILER_TOKEN_SALT),
+            })
+            profiles = list(Path(profile_dir).glob('*.prof'))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(profiles), 1)
+            functions = pstats.Stats(str(profiles[0])).stats
+            self.assertTrue(any(path.endswith('tasks/views.py') and name == 'get' for path, _, name in functions))
+
+
+class RequestProfilerTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+
+    def get(self, user=None, **headers):
+        if user is not None:
+            headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+        with override_settings(PROFILER_DIR=self.profile_dir.name):
+            response = APIClient().get('/api/tasks/', headers=headers)
+        self.assertEqual(response.status_code, 200 if user else 401)
+        return sorted(Path(self.profile_dir.name).glob('*.prof'))
+
+    def test_profiles_requests_with_a_profile_token(self):
+        self.assertEqual(self.get(self.user), [])
+        self.assertEqual(self.get(self.user, **{'X-Profile-Token': 'forged'}), [])
+
+        profiles = self.get(self.user, **{'X-Profile-Token': signing.dumps({'label': 'test'}, salt=PROFILER_TOKEN_SALT)})
+        self.assertEqual(len(profiles), 1)
+        self.assertIn('_GET_api_tasks_', profiles[0].name)
+
+    @override_settings(PROFILER_SAMPLE_RATE=1.0, PROFILER_MAX_FILES=2)
+    def test_samples_staff_requests_only(self):
+        self.assertEqual(self.get(), [])
+        self.assertEqual(self.get(self.user), [])
+
+        for _ in range(3):
+            profiles = self.get(self.staff)
+        # Older profiles are rotated out.
+        self.assertEqual(len(profiles), 2)
+
+
+class SlowQueryLogTests(TaskAPITestCase):
+    def test_slow_queries_are_logged_with_their_plan_and_view(self):
+        self.create_task()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertLogs('tasks.slow_queries', 'WARNING') as logs:
+            client.get('/api/tasks/')
+
+        task_queries = [message for message in logs.output if 'FROM "tasks_task"' in message]
+        self.assertTrue(task_queries)
+        self.assertIn('TaskListCreateView', task_queries[0])
+        self.assertIn('Query plan:', task_queries[0])
+
+    def test_repeated_query_shapes_are_flagged(self):
+        tasks = [self.create_task(title=f'Task {index}') for index in range(settings.SLOW_QUERY_REPEAT_THRESHOLD)]
+
+        with self.assertLogs('tasks.slow_queries', 'WARNING') as logs:
+            token = begin_scope('test_scope')
+            for task in tasks:
+                Task.objects.for_user(self.user).get(pk=task['id'])
+            end_scope(token)
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(f"repeated {settings.SLOW_QUERY_REPEAT_THRESHOLD} times in test_scope", logs.output[0])
+
+
+class BatchViewTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def batch(self, requests):
+        return self.client.post('/api/batch/', {'requests': requests}, format='json')
+
+    def test_dispatches_sub_requests_with_one_authentication(self):
+        task = self.create_task(title='First')
+
+        with mock.patch.object(
+            JWTAuthentication, 'get_validated_token', autospec=True, side_effect=JWTAuthentication.get_validated_token
+        ) as get_validated_token:
+            response = self.batch([
+                {'method': 'GET', 'path': '/api/register/'},
+                {'method': 'GET', 'path': '/api/tasks/?fields=title'},
+                {'method': 'POST', 'path': '/api/tasks/', 'body': {'title': 'Second'}},
+                {'method': 'PATCH', 'path': f"/api/tasks/{task['id']}/", 'body': {'status': 'completed'}},
+                {'method': 'GET', 'path': f"/api/tasks/{task['id']}/"},
+                {'method': 'DELETE', 'path': '/api/tasks/999999/'},
+            ])
+
+        self.assertEqual(get_validated_token.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        responses = response.data['responses']
+        self.assertEqual([sub['status'] for sub in responses], [200, 200, 201, 200, 200, 404])
+        self.assertEqual(responses[0]['body']['username'], 'alice')
+        self.assertEqual(responses[1]['body']['results'], [{'id': task['id'], 'title': 'First'}])
+        self.assertEqual(responses[2]['body']['title'], 'Second')
+        self.assertEqual(responses[4]['body']['status'], 'completed')
+
+    def test_rejects_invalid_sub_requests(self):
+        self.assertEqual(self.client.post('/api/batch/', {'requests': {}}, format='json').status_code, 400)
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/tasks/'}] * (settings.BATCH_MAX_REQUESTS + 1)).status_code, 400)
+
+        responses = self.batch([
+            'GET /api/tasks/',
+            {'method': 'PUT', 'path': '/api/tasks/'},
+            {'method': 'GET', 'path': '/api/missing/'},
+            {'method': 'GET', 'path': '/api/batch/'},
+            {'method': 'POST', 'path': '/api/login/'},
+        ]).data['responses']
+
+        self.assertEqual([sub['status'] for sub in responses], [400, 405, 404, 400, 400])
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.batch([{'path': '/api/tasks/'}]).status_code, 401)
+
+
+class DueTaskEmailTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.localtime().replace(second=0, microsecond=0) + timedelta(days=1)
+        self.bob = User.objects.create_user('bob', 'bob@example.com', 'password')
+
+        for user, title, minutes in (
+            (self.user, 'Standup', 5), (self.user, 'Review', 5), (self.user, 'Lunch', 10),
+            (self.bob, 'Deploy', 5), (self.bob, 'Later', 30),
+        ):
+            Task(user=user, title=title, due_date=self.now + timedelta(minutes=minutes)).save()
+
+    def send_due_task_emails(self):
+        with mock.patch('tasks.tasks.truncate_to_minute', return_value=self.now):
+            send_due_task_emails()
+
+    def test_digest_per_user_and_due_time(self):
+        self.send_due_task_emails()
+
+        sent = sorted((message.to, message.body.count('Title:')) for message in mail.outbox)
+        self.assertEqual(sent, [(['alice@example.com'], 1), (['alice@example.com'], 2), (['bob@example.com'], 1)])
+        html_messages = [message.alternatives[0][0] for message in mail.outbox]
+        self.assertTrue(any('Standup' in html and 'Review' in html for html in html_messages))
+
+    @override_settings(DUE_TASK_EMAIL_MODE='per_task')
+    def test_per_task_emails(self):
+        self.send_due_task_emails()
+
+        self.assertEqual(sorted(message.body.split('Title: ')[1].split('\n')[0] for message in mail.outbox), ['Deploy', 'Lunch', 'Review', 'Standup'])
+
+
+@override_settings(ROLLUP_WATERMARK_LAG=timedelta(0))
+class TaskRollupTests(TaskAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.shard = shard_for_user(self.user.id)
+
+    def today_counts(self, days=1):
+        return self.client.get('/api/tasks/analytics/', {'days': days}).data['totals']
+
+    def test_tasks_created_completed_are_counted(self):
+        tomorrow = timezone.now() + timedelta(days=1)
+        self.create_task(status='completed', due_date=tomorrow.isoformat())
+        self.create_task(due_date=tomorrow.isoformat())
+
+        update_shard_rollups(self.shard)
+
+        self.assertEqual(self.today_counts(), {'created': 2, 'completed': 1, 'overdue': 0, 'status_changes': 1})
+
+    def test_runs_fold_changes_since_the_watermark(self):
+        task = self.create_task()
+        Task.objects.for_user(self.user).filter(pk=task['id']).update(due_date=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(update_shard_rollups(self.shard), 1)
+        self.assertEqual(self.today_counts(), {'created': 1, 'completed': 0, 'overdue': 1, 'status_changes': 0})
+        watermark = RollupWatermark.objects.using(self.shard).get().value
+
+        # Nothing changed since the last run.
+        self.assertEqual(update_shard_rollups(self.shard), 0)
+
+        self.client.patch(f"/api/tasks/{task['id']}/", {'status': 'completed'}, format='json')
+        self.client.patch(f"/api/tasks/{task['id']}/", {'title': 'Renamed'}, format='json')
+        self.assertEqual(update_shard_rollups(self.shard), 1)
+
+        self.assertEqual(self.today_counts(), {'created': 1, 'completed': 1, 'overdue': 1, 'status_changes': 1})
+        self.assertGreater(RollupWatermark.objects.using(self.shard).get().value, watermark)
+
+    def test_recurring_series_are_not_counted_overdue(self):
+        series = self.create_task(due_date=(timezone.now() - timedelta(hours=1)).isoformat(), recurrence='FREQ=DAILY')
+        occurrence_date = timezone.localtime(parse_aware_datetime(series['due_date']))
+        self.client.patch(f"/api/tasks/{series['id']}/occurrences/{occurrence_date.isoformat()}/", {}, format='json')
+
+        update_shard_rollups(self.shard)
+
+        # Only the materialized occurrence is overdue.
+        self.assertEqual(self.today_counts()['overdue'], 1)
+
+    def test_tasks_created_overdue_are_counted_once(self):
+        update_shard_rollups(self.shard)
+        self.create_task(due_date=(timezone.now() - timedelta(days=2)).isoformat())
+
+        update_shard_rollups(self.shard)
+        update_shard_rollups(self.shard)
+
+        self.assertEqual(self.today_counts(days=3), {'created': 1, 'completed': 0, 'overdue': 1, 'status_changes': 0})
+
+    def test_late_commits_are_not_skipped(self):
+        with override_settings(ROLLUP_WATERMARK_LAG=timedelta(seconds=30)):
+            update_shard_rollups(self.shard)
+        watermark = RollupWatermark.objects.using(self.shard).get().value
+        self.assertLessEqual(watermark, timezone.now() - timedelta(seconds=30))
+
+        # A write stamped just before the previous run but committed after it.
+        task = self.create_task(status='completed', due_date=(timezone.now() + timedelta(days=1)).isoformat())
+        stamped_at = watermark + timedelta(seconds=29)
+        Task.objects.for_user(self.user).filter(pk=task['id']).update(
+            created_at=stamped_at, updated_at=stamped_at, status_changed_at=stamped_at
+        )
+
+        update_shard_rollups(self.shard)
+        self.assertEqual(self.today_counts(), {'created': 1, 'completed': 1, 'overdue': 0, 'status_changes': 1})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaskIdSeedingTests(TestCase):
+    databases = {'default', *settings.TASK_SHARDS}
+
+    def test_tickets_start_above_existing_tasks(self):
+        user = User.objects.create_user(username='alice', password='password')
+        shard = shard_for_user(user.id)
+        Task.objects.using(shard).bulk_create([Task(id=1000, user=user, title='Imported')])
+
+        seed_task_ids(shard)
+        self.assertGreater(allocate_task_id(), 1000)
+
+        # Seeding never moves the sequence backwards.
+        issued = allocate_task_id()
+        seed_task_ids(shard)
+        self.assertGreater(allocate_task_id(), issued)
+
+    @override_settings(TASK_ID_BLOCK_SIZE=10)
+    def test_ids_are_reserved_in_blocks(self):
+        seed_task_ids()
+
+        with CaptureQueriesContext(connections['default']) as queries:
+            ids = [allocate_task_id() for _ in range(10)]
+        self.assertEqual(ids, list(range(ids[0], ids[0] + 10)))
+        self.assertFalse(queries)
+
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertGreater(allocate_task_id(), ids[-1])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+
+    @override_settings(TASK_ID_BLOCK_SIZE=10)
+    def test_rolled_back_reservations_are_not_reused(self):
+        with self.assertRaises(RuntimeError), transaction.atomic(using='default'):
+            seed_task_ids()
+            issued = [allocate_task_id() for _ in range(10)]
+            raise RuntimeError('Rolled back')
+
+        self.assertGreater(allocate_task_id(), max(issued))
+
+
+@skipUnless(len(settings.TASK_SHARDS) > 1, 'Moving tasks needs at least two shards')
+@override_settings(CACHES=LOCMEM_CACHES)
+class RebalanceTaskShardTests(TestCase):
+    databases = {'default', *settings.TASK_SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        # The tables left on the primary database from before sharding was enabled.
+        with connections['default'].schema_editor() as editor:
+            for model in (Task, TaskTombstone, TaskDailyRollup):
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connections['default'].schema_editor() as editor:
+            for model in (Task, TaskTombstone, TaskDailyRollup):
+                editor.delete_model(model)
+
+    def setUp(self):
+        cache.clear()
+        self.legacy_user = User.objects.create_user(username='legacy', password='password')
+        self.user = User.objects.create_user(username='alice', password='password')
+        Task.objects.using('default').bulk_create([
+            Task(id=task_id, user=self.legacy_user, title=f'Legacy {task_id}') for task_id in (1, 2, 3)
+        ])
+        TaskTombstone.objects.using('default').create(id=1, user=self.legacy_user, task_id=4)
+
+    def move_legacy_user(self):
+        target = shard_for_user(self.user.id)
+        call_command('rebalance_task_shard', self.legacy_user.id, '--from', 'default', '--to', target, stdout=StringIO())
+        return target
+
+    def test_move_off_default_after_new_shard_tasks_exist(self):
+        # What `migrate --database shard_<n>` does when the shards are set up.
+        seed_task_ids('default')
+        new_task = Task(user=self.user, title='New')
+        new_task.save()
+        TaskTombstone.objects.for_user(self.user).create(user=self.user, task_id=new_task.id)
+
+        target = self.move_legacy_user()
+
+        self.assertEqual(shard_for_user(self.legacy_user.id), target)
+        self.assertEqual(
+            set(Task.objects.using(target).values_list('id', 'user_id')),
+            {(1, self.legacy_user.id), (2, self.legacy_user.id), (3, self.legacy_user.id), (new_task.id, self.user.id)},
+        )
+        self.assertEqual(TaskTombstone.objects.for_user(self.legacy_user).get().task_id, 4)
+        self.assertFalse(Task.objects.using('default').exists())
+
+    def test_move_seeds_ticket_sequence(self):
+        self.move_legacy_user()
+        self.assertGreater(allocate_task_id(), 3)
+
+
+@skipUnless(redis_available(), 'Redis is not available')
+class TelemetryTests(SimpleTestCase):
+    def setUp(self):
+        self.task = SimpleNamespace(name=f'tests.telemetry_{uuid.uuid4().hex}', request={})
+        self.addCleanup(get_redis_connection('default').delete, METRICS_KEY.format(self.task.name), RUNNING_KEY.format(self.task.name))
+
+    def metrics(self):
+        return get_metrics()[self.task.name]
+
+    @override_settings(METRICS_SCRAPE_TOKEN='scrape-secret')
+    def test_metrics_are_scrapeable_with_the_scrape_token(self):
+        record_start(task_id='first', task=self.task)
+        client = APIClient()
+
+        response = client.get('/api/metrics/celery/', HTTP_AUTHORIZATION='Token scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.task.name, response.content.decode())
+
+        self.assertEqual(client.get('/api/metrics/celery/', HTTP_AUTHORIZATION='Token guessed').status_code, 401)
+        self.assertEqual(client.get('/api/metrics/celery/').status_code, 401)
+        with override_settings(METRICS_SCRAPE_TOKEN=None):
+            self.assertEqual(client.get('/api/metrics/celery/', HTTP_AUTHORIZATION='Token ').status_code, 401)
+
+    def test_overlapping_executions(self):
+        record_start(task_id='first', task=self.task)
+        record_start(task_id='second', task=self.task)
+        self.assertEqual(self.metrics()['running'], 2)
+        self.assertEqual(self.metrics()['overlaps'], 1)
+
+        record_finish(task_id='first', task=self.task, state='SUCCESS')
+        self.assertEqual(self.metrics()['running'], 1)
+        self.assertEqual(self.metrics()['succeeded'], 1)
+
+    def test_execution_leaked_by_crashed_worker_expires(self):
+        started_at = timezone.now().timestamp() - RUNNING_TTL - 1
+        with mock.patch('tasks.telemetry.time', time=lambda: started_at):
+            record_start(task_id='crashed', task=self.task)
+
+        # Later runs keep starting, but the crashed execution no longer counts as running.
+        for task_id in ('next', 'after'):
+            record_start(task_id=task_id, task=self.task)
+            record_finish(task_id=task_id, task=self.task, state='SUCCESS')
+
+        self.assertEqual(self.metrics()['running'], 0)
+        self.assertNotIn('overlaps', self.metrics())
+
+
+@tag('subprocess')
+class StartupImportBudgetTests(SimpleTestCase):
+    """
+    Fails when the web or Celery worker cold start loads more modules than `STARTUP_IMPORT_BUDGET`.
+    """
+
+    def test_entry_points_start_within_budget(self):
+        for entry_point in settings.STARTUP_IMPORT_BUDGET:
+            with self.subTest(entry_point=entry_point):
+                profile = measure_startup(entry_point)
+                self.assertEqual(check_budget(entry_point, profile), [], f"started in {profile['seconds']:.3f}s")
+
+    def test_wall_time_is_not_budgeted(self):
+        profile = {'seconds': 60.0, 'modules': settings.STARTUP_IMPORT_BUDGET['web']}
+        self.assertEqual(check_budget('web', profile), [])
+        self.assertEqual(len(check_budget('web', {**profile, 'modules': profile['modules'] + 1})), 1)
+
+
+@tag('subprocess')
+@skipIf(is_sharded(), 'Already running against shards')
+class ShardedSuiteTests(SimpleTestCase):
+    """
+    Runs the suite again against two SQLite task shards, so that the cross-shard paths and the tests skipped
+    without shards are covered by a plain `manage.py test`. Tests tagged `subprocess` are not repeated.
+    """
+
+    def test_suite_passes_with_two_shards(self):
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'test', 'tasks', '--noinput', '--exclude-tag', 'subprocess'],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'TASK_SHARD_COUNT': '2'},
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-5000:])
@@ -0,0 +1,56 @@
+# Standard library imports
+import time
+
+# Django imports
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+# Third-party imports
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken, Token
+
+# Local imports
+from .constants import CACHE_REVOKED_TOKEN_KEY
+
+
+def revoke_token(jti, expires_at):
+    """
+    Marks the token identified by `jti` as revoked until its expiry (epoch seconds) in the cache.
+    """
+    timeout = int(expires_at - time.time())
+
+    if timeout > 0:
+        cache.set(CACHE_REVOKED_TOKEN_KEY.format(jti), True, timeout=timeout)
+
+
+def is_token_revoked(jti):
+    """
+    Returns whether the token identified by `jti` has been revoked.
+    """
+    return cache.get(CACHE_REVOKED_TOKEN_KEY.format(jti), False)
+
+
+class RedisRefreshToken(RefreshToken):
+    """
+    Refresh token that keeps its revocation state in Redis instead of the token blacklist tables.
+
+    Issuing a token writes nothing, revoking one stores its JTI with a TTL equal to the token's remaining
+    lifetime, and checking revocation is a single cache lookup.
+    """
+
+    def verify(self, *args, **kwargs):
+        Token.verify(self, *args, **kwargs)
+        self.check_blacklist()
+
+    def check_blacklist(self):
+        if is_token_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        revoke_token(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip `BlacklistMixin.for_user`, which records every issued token as an `OutstandingToken` row.
+        return super(BlacklistMixin, cls).for_user(user)
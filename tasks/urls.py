@@ -5,7 +5,10 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 # Local imports
-from .views import RegisterView, TaskListCreateView, TaskDetailView
+from .views import (
+    RegisterView, TaskListCreateView, TaskDetailView, TaskOccurrenceView, TaskSyncView, TaskEventStreamView, TaskAnalyticsView,
+    BatchView, CeleryMetricsView
+)
 
 app_name = 'tasks'
 
@@ -15,4 +18,10 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('tasks/', TaskListCreateView, name='task-list-create'),
     path('tasks/<int:pk>/', TaskDetailView, name='task-detail'),
+    path('tasks/<int:pk>/occurrences/<str:occurrence>/', TaskOccurrenceView, name='task-occurrence'),
+    path('tasks/sync/', TaskSyncView, name='task-sync'),
+    path('tasks/events/', TaskEventStreamView, name='task-events'),
+    path('tasks/analytics/', TaskAnalyticsView, name='task-analytics'),
+    path('batch/', BatchView, name='batch'),
+    path('metrics/celery/', CeleryMetricsView, name='celery-metrics'),
 ]
@@ -1,6 +1,14 @@
+# Standard library imports
+import time
+
 # Django imports
 from django.core.cache import cache
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Local imports
+from .constants import CACHE_TASK_LIST_VERSION_KEY
 
 
 def truncate_to_minute(dt):
@@ -10,8 +18,56 @@ def truncate_to_minute(dt):
     return dt.replace(second=0, microsecond=0)
 
 
+def parse_aware_datetime(value):
+    """
+    Parses the ISO 8601 string `value` into an aware datetime, in the current time zone if it has none.
+
+    Returns `None` when `value` is missing or invalid.
+    """
+    try:
+        dt = parse_datetime(value or '')
+    except ValueError:
+        return None
+
+    if dt and timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def project_fields(data, fields):
+    """
+    Returns `data` limited to `fields`, or `data` itself when `fields` is `None`.
+    """
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields}
+
+
 def set_cache(key, data):
     """
     Sets `data` in Django cache with specified `key` and timeout from settings.
     """
     cache.set(key, data, timeout=settings.CACHE_TTL)
+
+
+def set_many_cache(data):
+    """
+    Sets every key/value pair of `data` in Django cache with timeout from settings.
+    """
+    cache.set_many(data, timeout=settings.CACHE_TTL)
+
+
+def get_task_list_version(user_id):
+    """
+    Returns the version of the user's cached task list pages.
+    """
+    return cache.get(CACHE_TASK_LIST_VERSION_KEY.format(user_id), 0)
+
+
+def invalidate_task_list(user_id):
+    """
+    Invalidates all cached task list pages of the user by moving them to a new version.
+
+    A timestamp is used instead of a counter so that an evicted version key can never resurrect stale pages.
+    """
+    cache.set(CACHE_TASK_LIST_VERSION_KEY.format(user_id), time.time_ns(), timeout=None)
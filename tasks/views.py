@@ -1,23 +1,47 @@
 # Standard library imports
+import asyncio
+import json
 import logging
+import math
 import sys
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import urlsplit
 
 # Django imports
 from django.conf import settings
 from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from django.views import View
 
 # Third-party imports
+from asgiref.sync import sync_to_async
 from rest_framework import permissions, throttling, pagination
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 
 # Local imports
-from .models import User, Task
-from .utils import set_cache
+from .events import get_event_hub, publish_task_event
+from .models import User, Task, TaskTombstone, TaskDailyRollup, TooManyOccurrences
+from .permissions import HasMetricsScrapeToken
+from .utils import parse_aware_datetime, project_fields, set_cache, set_many_cache, get_task_list_version, invalidate_task_list
 from .serializers import UserSerializer, TaskSerializer
-from .constants import RESPONSE_500, CACHE_USER_KEY, CACHE_TASK_KEY
+from .constants import (
+    RESPONSE_401, RESPONSE_500, RESPONSE_INVALID_SINCE, RESPONSE_INVALID_DAYS, RESPONSE_INVALID_BATCH, RESPONSE_SYNC_EXPIRED, CACHE_USER_KEY, CACHE_TASK_KEY,
+    CACHE_TASK_DETAIL_KEY, BATCH_METHODS, BATCH_EXCLUDED_URL_NAMES, RESPONSE_INVALID_WINDOW, RESPONSE_INVALID_OCCURRENCE,
+    RESPONSE_TOO_MANY_OCCURRENCES, RESPONSE_CANCELLED_OCCURRENCE
+)
 
 
 logger = logging.getLogger(__name__)
@@ -61,7 +85,7 @@ class RegisterView(APIView):
                 cache_key = CACHE_USER_KEY.format(request.user.id)
                 cache.delete(cache_key)
 
-                refresh = RefreshToken.for_user(user)
+                refresh = import_string(api_settings.TOKEN_OBTAIN_SERIALIZER).get_token(user)
 
                 return Response({
                     'refresh': str(refresh),
@@ -101,7 +125,12 @@ class TaskListCreateView(APIView):
     """
     View for listing and creating tasks for authenticated users.
 
-    - GET: Retrieves paginated list of tasks for the authenticated user, caching if not already cached.
+    - GET: Retrieves paginated list of tasks for the authenticated user. Cached pages hold only the
+      count and the ordered task ids; the tasks themselves come from the per-task cache and the page
+      links are built for each request. `?fields=` limits the output to the given fields and tasks missing
+      from the cache are then loaded with only those columns, without filling the per-task cache. With
+      `?start=&end=`, lists only the tasks due in that window instead, with the occurrences of recurring
+      tasks expanded in place of their series.
     - POST: Creates a new task instance associated with the authenticated user.
 
     """
@@ -112,20 +141,42 @@ class TaskListCreateView(APIView):
     def get(self, request):
         try:
             user = request.user
-            cache_key = CACHE_TASK_KEY.format(user.id)
-            cached_tasks = cache.get(cache_key)
-
-            if cached_tasks:
-                return Response(cached_tasks)
+            fields = TaskSerializer.get_requested_fields(request.query_params.get('fields'))
+            if 'start' in request.query_params or 'end' in request.query_params:
+                return self.get_window(request, fields)
 
             paginator = self.pagination_class()
-            tasks = Task.objects.filter(user=user)
-            results = paginator.paginate_queryset(tasks, request)
-            serializer = TaskSerializer(results, many=True)
-            response = paginator.get_paginated_response(serializer.data)
-
-            set_cache(cache_key, response.data)
-            return response
+            page_number = request.query_params.get(paginator.page_query_param, 1)
+            cache_key = CACHE_TASK_KEY.format(user.id, get_task_list_version(user.id), page_number)
+            cached_page = cache.get(cache_key)
+
+            if cached_page:
+                results = self.get_tasks_data(user, cached_page['ids'], fields)
+            else:
+                tasks = Task.objects.for_user(user).order_by('id')
+                if fields:
+                    tasks = tasks.only(*fields)
+                tasks = TaskSerializer(paginator.paginate_queryset(tasks, request), many=True, fields=fields).data
+                if fields is None:
+                    set_many_cache({CACHE_TASK_DETAIL_KEY.format(user.id, task['id']): task for task in tasks})
+
+                cached_page = {
+                    'count': paginator.page.paginator.count,
+                    'number': paginator.page.number,
+                    'ids': [task['id'] for task in tasks],
+                }
+                set_cache(cache_key, cached_page)
+                results = tasks
+
+            return Response({
+                'count': cached_page['count'],
+                **self.get_page_links(request, paginator, cached_page['number'], cached_page['count']),
+                'results': results,
+            })
+        except NotFound as e:
+            return Response({'detail': e.detail}, status=404)
+        except ValidationError as e:
+            return Response(e.detail, status=400)
         except Exception as e:
             _, __, tb = sys.exc_info()
             logger.error(f"Error in TaskListCreateView GET: {str(e)} at lineno: {tb.tb_lineno}")
@@ -136,8 +187,9 @@ class TaskListCreateView(APIView):
             serializer = TaskSerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save(user=request.user)
-                cache_key = CACHE_TASK_KEY.format(request.user.id)
-                cache.delete(cache_key)
+                set_cache(CACHE_TASK_DETAIL_KEY.format(request.user.id, serializer.data['id']), serializer.data)
+                invalidate_task_list(request.user.id)
+                publish_task_event(request.user.id, 'created', serializer.data)
                 return Response(serializer.data, status=201)
             return Response(serializer.errors, status=400)
         except Exception as e:
@@ -145,31 +197,121 @@ class TaskListCreateView(APIView):
             logger.error(f"Error in TaskListCreateView POST: {str(e)} at lineno: {tb.tb_lineno}")
             return Response(RESPONSE_500, status=500)
 
+    def get_window(self, request, fields=None):
+        """
+        Returns the page of tasks due between `start` and `end` ordered by due date, expanding recurring tasks
+        into their occurrences up to `RECURRENCE_MAX_OCCURRENCES`. Windowed pages are not cached.
+        """
+        start = parse_aware_datetime(request.query_params.get('start'))
+        end = parse_aware_datetime(request.query_params.get('end'))
+
+        if start is None or end is None or not start <= end <= start + settings.RECURRENCE_MAX_WINDOW:
+            detail = RESPONSE_INVALID_WINDOW['detail'].format(settings.RECURRENCE_MAX_WINDOW.days)
+            return Response({'detail': detail}, status=400)
+
+        tasks = Task.objects.for_user(request.user)
+        window_tasks = list(tasks.filter(recurrence='', due_date__gte=start, due_date__lte=end))
+        try:
+            window_tasks += tasks.expand_occurrences(
+                start, end, settings.RECURRENCE_MAX_OCCURRENCES, settings.RECURRENCE_MAX_SERIES_OCCURRENCES
+            )
+        except TooManyOccurrences:
+            return Response(RESPONSE_TOO_MANY_OCCURRENCES, status=400)
+        window_tasks.sort(key=lambda task: (task.due_date, task.id or task.series_id))
+
+        paginator = self.pagination_class()
+        results = paginator.paginate_queryset(window_tasks, request)
+        return paginator.get_paginated_response(TaskSerializer(results, many=True, fields=fields).data)
+
+    def get_page_links(self, request, paginator, number, count):
+        """
+        Returns the `next` and `previous` links of page `number` out of `count` tasks for this request.
+        """
+        url = request.build_absolute_uri()
+        page_count = max(math.ceil(count / paginator.get_page_size(request)), 1)
+
+        if number <= 1:
+            previous_link = None
+        elif number == 2:
+            previous_link = remove_query_param(url, paginator.page_query_param)
+        else:
+            previous_link = replace_query_param(url, paginator.page_query_param, number - 1)
+
+        return {
+            'next': replace_query_param(url, paginator.page_query_param, number + 1) if number < page_count else None,
+            'previous': previous_link,
+        }
+
+    def get_tasks_data(self, user, ids, fields=None):
+        """
+        Returns the serialized tasks with the given `ids`, in order, reading them from the per-task cache
+        with one multi-get and fetching only the missing ones from the database in one query.
+
+        With `fields`, missing tasks are loaded with only those columns and not cached; otherwise they are
+        loaded in full and cached.
+        """
+        cache_keys = {task_id: CACHE_TASK_DETAIL_KEY.format(user.id, task_id) for task_id in ids}
+        cached_tasks = cache.get_many(cache_keys.values())
+        tasks_by_id = {
+            task_id: project_fields(cached_tasks[key], fields)
+            for task_id, key in cache_keys.items() if key in cached_tasks
+        }
+
+        missing_ids = [task_id for task_id in ids if task_id not in tasks_by_id]
+        if missing_ids:
+            missing_tasks = Task.objects.for_user(user).filter(id__in=missing_ids)
+            if fields:
+                missing_tasks = missing_tasks.only(*fields)
+            missing_tasks = TaskSerializer(missing_tasks, many=True, fields=fields).data
+            if fields is None:
+                set_many_cache({cache_keys[task['id']]: task for task in missing_tasks})
+            tasks_by_id.update((task['id'], task) for task in missing_tasks)
+
+        # Tasks deleted since the page was cached are skipped.
+        return [tasks_by_id[task_id] for task_id in ids if task_id in tasks_by_id]
+
 class TaskDetailView(APIView):
     """
     View for retrieving, updating, and deleting individual tasks for authenticated users.
 
-    - GET: Retrieves details of a specific task belonging to the authenticated user.
+    - GET: Retrieves details of a specific task belonging to the authenticated user, caching if not already cached.
+      `?fields=` limits the output to the given fields. Like the list, a sparse request that misses the cache
+      loads only those columns and does not fill the per-task cache.
     - PATCH: Updates details of a specific task belonging to the authenticated user.
-    - DELETE: Deletes a specific task belonging to the authenticated user.
+    - DELETE: Deletes a specific task belonging to the authenticated user, along with the materialized
+      occurrences of a recurring task. A deleted occurrence is kept as cancelled so that it is not expanded again.
 
     """
     permission_classes = [permissions.IsAuthenticated]
     throttle_classes = [throttling.UserRateThrottle]
 
-    def get_task(self, pk, user):
+    def get_task(self, pk, user, fields=None):
         try:
-            return Task.objects.get(pk=pk, user=user)
+            tasks = Task.objects.for_user(user)
+            if fields:
+                tasks = tasks.only(*fields)
+            return tasks.get(pk=pk)
         except Task.DoesNotExist:
             raise NotFound()
 
     def get(self, request, pk):
         try:
-            task = self.get_task(pk, request.user)
-            serializer = TaskSerializer(task)
+            fields = TaskSerializer.get_requested_fields(request.query_params.get('fields'))
+            cache_key = CACHE_TASK_DETAIL_KEY.format(request.user.id, pk)
+            cached_task = cache.get(cache_key)
+
+            if cached_task:
+                return Response(project_fields(cached_task, fields))
+
+            task = self.get_task(pk, request.user, fields)
+            serializer = TaskSerializer(task, fields=fields)
+            if fields is None:
+                set_cache(cache_key, serializer.data)
             return Response(serializer.data)
         except NotFound:
             return Response({"detail": "Task not found."}, status=404)
+        except ValidationError as e:
+            return Response(e.detail, status=400)
         except Exception as e:
             _, __, tb = sys.exc_info()
             logger.error(f"Error in TaskDetailView GET: {str(e)} at lineno: {tb.tb_lineno}")
@@ -181,8 +323,8 @@ class TaskDetailView(APIView):
             serializer = TaskSerializer(task, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                cache_key = CACHE_TASK_KEY.format(request.user.id)
-                cache.delete(cache_key)
+                set_cache(CACHE_TASK_DETAIL_KEY.format(request.user.id, pk), serializer.data)
+                publish_task_event(request.user.id, 'updated', serializer.data)
                 return Response(serializer.data)
             return Response(serializer.errors, status=400)
         except NotFound:
@@ -195,9 +337,23 @@ class TaskDetailView(APIView):
     def delete(self, request, pk):
         try:
             task = self.get_task(pk, request.user)
-            task.delete()
-            cache_key = CACHE_TASK_KEY.format(request.user.id)
-            cache.delete(cache_key)
+            shard = task._state.db
+            with transaction.atomic(using=shard):
+                if task.series_id:
+                    # The row of a deleted occurrence is kept so that its series does not expand it again.
+                    deleted_ids = [task.id]
+                    task.is_cancelled = True
+                    task.save(update_fields=['is_cancelled', 'updated_at'])
+                else:
+                    deleted_ids = [task.id, *task.exceptions.filter(is_cancelled=False).values_list('id', flat=True)]
+                    task.delete()
+                TaskTombstone.objects.using(shard).bulk_create(
+                    TaskTombstone(user=request.user, task_id=task_id) for task_id in deleted_ids
+                )
+            cache.delete_many([CACHE_TASK_DETAIL_KEY.format(request.user.id, task_id) for task_id in deleted_ids])
+            invalidate_task_list(request.user.id)
+            for task_id in deleted_ids:
+                publish_task_event(request.user.id, 'deleted', {'id': task_id})
             return Response({'detail': 'Content deleted.'}, status=204)
         except NotFound:
             return Response({"detail": "Task not found."}, status=404)
@@ -206,8 +362,329 @@ class TaskDetailView(APIView):
             logger.error(f"Error in TaskDetailView DELETE: {str(e)} at lineno: {tb.tb_lineno}")
             return Response(RESPONSE_500, status=500)
 
+class TaskOccurrenceView(APIView):
+    """
+    View for editing a single occurrence of a recurring task.
+
+    - PATCH: Materializes the occurrence of recurring task `pk` due at `occurrence` (an ISO 8601 datetime) as a
+      task of its own pointing back to the series, and updates it, e.g. to complete it. Patching an occurrence
+      that was already materialized updates the existing task.
+
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [throttling.UserRateThrottle]
+
+    def patch(self, request, pk, occurrence):
+        try:
+            try:
+                series = Task.objects.for_user(request.user).exclude(recurrence='').get(pk=pk)
+            except Task.DoesNotExist:
+                return Response({"detail": "Task not found."}, status=404)
+
+            occurrence_date = parse_aware_datetime(occurrence)
+            occurrences = series.get_occurrences(occurrence_date, occurrence_date) if occurrence_date else []
+            if not occurrences:
+                return Response(RESPONSE_INVALID_OCCURRENCE, status=404)
+
+            task = Task.objects.using(series._state.db).filter(series=series, occurrence_date=occurrence_date).first()
+            if task is not None and task.is_cancelled:
+                return Response(RESPONSE_CANCELLED_OCCURRENCE, status=404)
+
+            created = task is None
+            if created:
+                task = series.make_occurrence(occurrences[0])
+
+            serializer = TaskSerializer(task, data=request.data, partial=True)
+            if serializer.is_valid():
+                serializer.save()
+                set_cache(CACHE_TASK_DETAIL_KEY.format(request.user.id, serializer.data['id']), serializer.data)
+                if created:
+                    invalidate_task_list(request.user.id)
+                publish_task_event(request.user.id, 'created' if created else 'updated', serializer.data)
+                return Response(serializer.data, status=201 if created else 200)
+            return Response(serializer.errors, status=400)
+        except Exception as e:
+            _, __, tb = sys.exc_info()
+            logger.error(f"Error in TaskOccurrenceView PATCH: {str(e)} at lineno: {tb.tb_lineno}")
+            return Response(RESPONSE_500, status=500)
+
+class TaskSyncView(APIView):
+    """
+    View for incrementally syncing a client's local copy of its tasks.
+
+    - GET: Returns tasks updated and ids of tasks deleted after the `since` watermark, along with
+      a new watermark to pass as `since` on the next sync.
+
+    `updated_at` is set before a write commits, so the returned watermark lags `SYNC_WATERMARK_LAG` behind
+    the query and the next sync returns recent changes again. Clients apply changes idempotently.
+
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [throttling.UserRateThrottle]
+
+    def get_since(self, request):
+        try:
+            since = parse_datetime(request.query_params.get('since', ''))
+        except ValueError:
+            return None
+
+        if since and timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def get(self, request):
+        try:
+            since = self.get_since(request)
+            if since is None:
+                return Response(RESPONSE_INVALID_SINCE, status=400)
+
+            now = timezone.now()
+            if since < now - settings.TOMBSTONE_RETENTION:
+                return Response(RESPONSE_SYNC_EXPIRED, status=410)
+
+            watermark = max(since, now - settings.SYNC_WATERMARK_LAG)
+            changed_tasks = Task.objects.for_user(request.user).filter(updated_at__gt=since).order_by('updated_at')
+            deleted_ids = TaskTombstone.objects.for_user(request.user).filter(
+                deleted_at__gt=since
+            ).values_list('task_id', flat=True)
+
+            return Response({
+                'watermark': watermark,
+                'changed': TaskSerializer(changed_tasks, many=True).data,
+                'deleted': list(deleted_ids),
+            })
+        except Exception as e:
+            _, __, tb = sys.exc_info()
+            logger.error(f"Error in TaskSyncView GET: {str(e)} at lineno: {tb.tb_lineno}")
+            return Response(RESPONSE_500, status=500)
+
+class TaskEventStreamView(View):
+    """
+    Async view pushing task created/updated/deleted events to the authenticated user's clients.
+
+    - GET: Streams events as Server-Sent Events. With `?mode=poll`, waits for the next events instead
+      and returns them as JSON (long-poll fallback).
+
+    The access token is read from the `Authorization` header or, since `EventSource` cannot set
+    headers, from the `token` query parameter. Serve it from the ASGI application so that idle
+    connections do not each hold a worker thread.
+    """
+
+    async def get(self, request):
+        try:
+            user = await self.authenticate(request)
+        except AuthenticationFailed:
+            return JsonResponse(RESPONSE_401, status=401)
+
+        if request.GET.get('mode') == 'poll':
+            return await self.long_poll(user.id)
+
+        response = StreamingHttpResponse(self.stream(user.id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def authenticate(self, request):
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+
+        if header:
+            raw_token = authentication.get_raw_token(header)
+        else:
+            raw_token = request.GET.get('token', '').encode() or None
+
+        if raw_token is None:
+            raise InvalidToken()
+
+        validated_token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(validated_token)
+
+    async def long_poll(self, user_id):
+        hub = get_event_hub()
+        queue = hub.subscribe(user_id)
+        try:
+            try:
+                messages = [await asyncio.wait_for(queue.get(), timeout=settings.TASK_EVENTS_LONG_POLL_TIMEOUT)]
+            except asyncio.TimeoutError:
+                messages = []
+
+            while not queue.empty():
+                messages.append(queue.get_nowait())
+
+            return JsonResponse({'events': [json.loads(message) for message in messages]})
+        finally:
+            hub.unsubscribe(user_id, queue)
+
+    async def stream(self, user_id):
+        hub = get_event_hub()
+        queue = hub.subscribe(user_id)
+        try:
+            yield f'retry: {settings.TASK_EVENTS_RETRY_MS}\n\n'
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=settings.TASK_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+
+                yield f"event: {json.loads(message)['event']}\ndata: {message}\n\n"
+        finally:
+            hub.unsubscribe(user_id, queue)
+
+class TaskAnalyticsView(APIView):
+    """
+    View for task completion and overdue trends of the authenticated user.
+
+    - GET: Returns per-day created, completed, overdue and status change counts for the last `days` days
+      (default `ANALYTICS_DEFAULT_DAYS`), with totals and the completion rate. Reads only the daily rollups.
+      Occurrences of recurring tasks count as overdue only once they are materialized.
+
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [throttling.UserRateThrottle]
+    counters = ('created', 'completed', 'overdue', 'status_changes')
+
+    def get(self, request):
+        try:
+            try:
+                days = int(request.query_params.get('days', settings.ANALYTICS_DEFAULT_DAYS))
+            except ValueError:
+                days = 0
+
+            if not 1 <= days <= settings.ANALYTICS_MAX_DAYS:
+                detail = RESPONSE_INVALID_DAYS['detail'].format(settings.ANALYTICS_MAX_DAYS)
+                return Response({'detail': detail}, status=400)
+
+            today = timezone.localdate()
+            start = today - timedelta(days=days - 1)
+            rollups = {
+                rollup['day']: rollup
+                for rollup in TaskDailyRollup.objects.for_user(request.user).filter(
+                    day__gte=start, day__lte=today
+                ).values('day', *self.counters)
+            }
+
+            series = []
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                rollup = rollups.get(day, {})
+                series.append({'day': day, **{counter: rollup.get(counter, 0) for counter in self.counters}})
+
+            totals = {counter: sum(entry[counter] for entry in series) for counter in self.counters}
+            completion_rate = round(totals['completed'] / totals['created'], 4) if totals['created'] else None
+
+            return Response({'days': series, 'totals': totals, 'completion_rate': completion_rate})
+        except Exception as e:
+            _, __, tb = sys.exc_info()
+            logger.error(f"Error in TaskAnalyticsView GET: {str(e)} at lineno: {tb.tb_lineno}")
+            return Response(RESPONSE_500, status=500)
+
+
+class BatchView(APIView):
+    """
+    View for running several API requests in one round trip.
+
+    - POST: Accepts `{"requests": [{"method": "GET", "path": "/api/tasks/?page=2", "body": {...}}, ...]}`
+      and dispatches each sub-request in-process to the matching view in `tasks.urls`, authenticated as the
+      batch's user without re-validating the token and without running the middleware again. Returns
+      `{"responses": [{"status": ..., "body": ...}, ...]}` in request order. Sub-requests are still
+      throttled by their views.
+
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        try:
+            sub_requests = request.data.get('requests') if isinstance(request.data, dict) else None
+
+            if not isinstance(sub_requests, list) or not 1 <= len(sub_requests) <= settings.BATCH_MAX_REQUESTS:
+                detail = RESPONSE_INVALID_BATCH['detail'].format(settings.BATCH_MAX_REQUESTS)
+                return Response({'detail': detail}, status=400)
+
+            return Response({'responses': [self.dispatch_sub_request(request, sub) for sub in sub_requests]})
+        except Exception as e:
+            _, __, tb = sys.exc_info()
+            logger.error(f"Error in BatchView POST: {str(e)} at lineno: {tb.tb_lineno}")
+            return Response(RESPONSE_500, status=500)
+
+    def dispatch_sub_request(self, request, sub_request):
+        if not isinstance(sub_request, dict):
+            return {'status': 400, 'body': {'detail': 'Each sub-request must be an object.'}}
+
+        method = str(sub_request.get('method', 'GET')).upper()
+        url = urlsplit(str(sub_request.get('path', '')))
+
+        if method not in BATCH_METHODS:
+            return {'status': 405, 'body': {'detail': f'Method "{method}" not allowed in a batch.'}}
+
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return {'status': 404, 'body': {'detail': 'Not found.'}}
+
+        if match.namespace != 'tasks' or match.url_name in BATCH_EXCLUDED_URL_NAMES:
+            return {'status': 400, 'body': {'detail': f'"{url.path}" cannot be batched.'}}
+
+        body = json.dumps(sub_request.get('body', {})).encode() if method in ('POST', 'PATCH') else b''
+        environ = {key: value for key, value in request.META.items() if isinstance(value, str)}
+        environ.update({
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+            'wsgi.url_scheme': request.scheme,
+        })
+        django_request = WSGIRequest(environ)
+
+        # Reuse the batch's authentication instead of validating the token again.
+        django_request._force_auth_user = request.user
+        django_request._force_auth_token = request.auth
+
+        try:
+            response = match.func(django_request, *match.args, **match.kwargs)
+        except Exception as e:
+            logger.error(f"Error in BatchView sub-request {method} {url.path}: {str(e)}")
+            return {'status': 500, 'body': RESPONSE_500}
+
+        if hasattr(response, 'data'):
+            return {'status': response.status_code, 'body': response.data}
+        return {'status': response.status_code, 'body': response.content.decode()}
+
+
+class CeleryMetricsView(APIView):
+    """
+    View exposing Celery task telemetry to staff users and metrics scrapers.
+
+    - GET: Returns queue latency and runtime histograms, execution and overlap counters, and
+      task-specific counters in the Prometheus text exposition format. Scrapers authenticate with the
+      static `METRICS_SCRAPE_TOKEN` instead of a JWT.
+
+    """
+    permission_classes = [permissions.IsAdminUser | HasMetricsScrapeToken]
+
+    def get(self, request):
+        try:
+            # Imported here because the telemetry module loads Celery, which web workers otherwise never need.
+            from .telemetry import get_metrics, render_prometheus
+
+            return HttpResponse(render_prometheus(get_metrics()), content_type='text/plain; version=0.0.4')
+        except Exception as e:
+            _, __, tb = sys.exc_info()
+            logger.error(f"Error in CeleryMetricsView GET: {str(e)} at lineno: {tb.tb_lineno}")
+            return Response(RESPONSE_500, status=500)
+
 
 # Convert Class-Based Views to View Functions
 RegisterView = RegisterView.as_view()
 TaskListCreateView = TaskListCreateView.as_view()
-TaskDetailView = TaskDetailView.as_view()
\ No newline at end of file
+TaskDetailView = TaskDetailView.as_view()
+TaskOccurrenceView = TaskOccurrenceView.as_view()
+TaskSyncView = TaskSyncView.as_view()
+TaskEventStreamView = TaskEventStreamView.as_view()
+TaskAnalyticsView = TaskAnalyticsView.as_view()
+BatchView = BatchView.as_view()
+CeleryMetricsView = CeleryMetricsView.as_view()
\ No newline at end of file